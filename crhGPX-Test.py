@@ -26,13 +26,15 @@ inputF = 'crhGPX-Test.gpx'
 parser = argparse.ArgumentParser(description="process map route gpx (GPS Exchange Format xml) data")
 parser.add_argument('-i', '--input', action="store", dest="infile",
                     help='input filename with extension (eg: crhGPX-Test.gpx)')
+parser.add_argument('-s', '--stream', action="store_true", dest="stream",
+                    help='parse gpx file in streaming (constant memory) mode')
 args = parser.parse_args()
 if args.infile:
     inputF = args.infile
 
 # process data
 print ''
-gpxData = crhGPX.gpx(inputF)
+gpxData = crhGPX.gpx(inputF, stream = args.stream)
 ok = gpxData.validData()
 
 if ok:
@@ -43,6 +45,13 @@ if ok:
 else:
     statusErrMsg('error', 'main', 'unable to process gpx file: {}'.format(inputF))
 
+# stream & tree modes must use the same way-points (<rte> before <trk> in file)
+routeF = 'crhGPX-Test-Route.gpx'
+(treeData, streamData) = (crhGPX.gpx(routeF), crhGPX.gpx(routeF, stream = True))
+print '{} stream & tree mode BSVs, stats match: {}, {}'.format(routeF,
+    treeData.genBSV().getvalue() == streamData.genBSV().getvalue(), treeData.getStats() == streamData.getStats())
+print streamData.genStats().getvalue()
+
 ## tidy up
 
 errTMsg('{} ending normally ({:06.2f}sec)'.format(getProgName(), crhTimer.timer.stop()))
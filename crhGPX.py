@@ -3,25 +3,54 @@
 # v1.00 crh 20-jun-15 -- initial release
 # v1.12 crh 01-jul-15 -- cater for gpx files with no namespaces defined, etc
 # v1.24 crh 19-oct-15 -- output more delta time stats, etc
+# v1.25 crh 17-oct-26 -- way-points projected once (in one pass) & reused by all stages
+# v1.26 crh 17-oct-26 -- constant memory streaming (iterparse) mode added
+# v1.27 crh 17-oct-26 -- way-points kept in a columnar numpy store (_track)
+# v1.28 crh 17-oct-26 -- deltas & statistics calculated from whole arrays
+# v1.29 crh 17-oct-26 -- fast ISO 8601 time stamp parsing (isoTime(), isoTimeArray()), UTC offsets applied
+# v1.30 crh 17-oct-26 -- way-point values extracted in one pass, prefixed namespace & no namespace gpx files
+# v1.31 crh 17-oct-26 -- lazy processing stages, each run only when (& once) its results are required
+# v1.32 crh 17-oct-26 -- batchProcess() parallel batch processing & python -m crhGPX batch tool, exceptions not always fatal
+# v1.33 crh 17-oct-26 -- BSV/xml output track simplification (Douglas-Peucker & Visvalingam-Whyatt) added
+# v1.34 crh 17-oct-26 -- BSV & xml output written incrementally, optionally straight to a file
+# v1.35 crh 17-oct-26 -- optional binary (.npz) cache file for parsed way-points
+# v1.36 crh 17-oct-26 -- stream mode picks way-point tag in gpx.tags order (as tree mode)
 # optimised for gpx files created for walks or by satnav devices on walks
 
 #!/usr/local/bin/python
 
 import re
+import os
+import sys
+import glob
 import datetime
 import time
+import calendar
+import argparse
+import hashlib
+import json
+import zipfile
+import multiprocessing
 from StringIO import StringIO
+from collections import OrderedDict
 from lxml import etree
+import numpy as np
 
 from crhDebug import *
 from crhString import *
 from crhMap import *
+import crhMap
+
+fatalException = True   # generates fatal exceptions as required if set true (default), as crhMap
 
 maxDeltaL = 400.0  # exceeding this triggers warning message (m)
 maxDeltaV = 30.0   # exceeding this triggers warning message (m)
 maxDeltaS = 250.0  # exceeding this triggers information message (sec)
 
-decimalSecs = re.compile(r'\.\d+')  # used to remove decimal secs part of time stamp
+isoTail = re.compile(r'^(\.\d+)?(Z|([+-])(\d\d):(\d\d))?$')  # ISO 8601 time stamp after seconds digits
+
+_isoPrefixes = {}   # UTC epoch seconds of 'YYYY-MM-DDTHH' time stamp prefixes (see isoTime())
+_isoPrefixesMax = 10000
 
 class gpx(object):
     '''
@@ -40,12 +69,31 @@ class gpx(object):
     tolerV = 5          # vertical tolerance (m) for disregarding height gain/loss increment
     tolerT = 12         # time tolerance (sec) for discarding adjacent gpx way-point record
     precision = 8       # nat grid ref precision (6|6|10 digits)
+    simplifyL = 0       # Douglas-Peucker tolerance (m) for simplifying BSV/xml output track (0 disables)
+    simplifyN = 0       # Visvalingam-Whyatt way-point count for simplifying BSV/xml output track (0 disables)
+    cache = False       # keep parsed way-points in a binary (.npz) cache file, used while gpx file unchanged
+    cacheDir = None     # directory for cache files (default: alongside gpx file, ie: <gpx file>.npz)
+    cacheVersion = 2    # cache file format
+    # way-point store fields, NaN where missing (+ ts field, sized to suit)
+    trackDtype = [('lat', 'f8'), ('lon', 'f8'), ('elev', 'f8'), ('secs', 'f8'), ('east', 'i8'), ('north', 'i8'),
+                  ('deltaL', 'f8'), ('deltaV', 'f8'), ('deltaS', 'f8')]
+    # processing stages, run once on first use: stage -> (method, stages required first)
+    stages = {'parse': ('_parse', ()), 'project': ('_project', ('parse',)), 'deltas': ('_setDeltas', ('project',)),
+              'elevs': ('_setElevs', ('parse',))}
+    # stage setting each _stats value (see getStats())
+    statStages = dict([(key, 'parse') for key in ('nr', 'discardT', 'startTs', 'endTs')] +
+                      [(key, 'deltas') for key in ('dist', 'deltaL', 'deltaV', 'deltaS', 'startX', 'startY', 'endX', 'endY')] +
+                      [(key, 'elevs') for key in ('start', 'end', 'hi', 'lo', 'up', 'dn', 'upAbs', 'dnAbs', 'vi')])
     
     ## instance methods
-    def __init__(self, inputF, time = True, delta = False, tolerT = None, tolerV = None, tolerL = None, precision = None):
+    def __init__(self, inputF, time = True, delta = False, tolerT = None, tolerV = None, tolerL = None, precision = None,
+                 stream = False, simplifyL = None, simplifyN = None, cache = None):
         '''
-        initialise object
+        initialise object, the gpx file is processed in stages as (& only when) results are required
         inputF -- gpx data file
+        stream -- parse gpx file incrementally in constant memory (xml document tree not retained)
+        simplifyL, simplifyN -- simplify BSV/xml output track (see gpx.simplifyL, gpx.simplifyN)
+        cache  -- load way-points from (or save them to) a cache file (see gpx.cache), gpx file names only
         '''
         if tolerT is None:  # can't refer to class/instance variables in method params!
             self._tolerT = gpx.tolerT   # time tolerance (sec)
@@ -63,6 +111,8 @@ class gpx(object):
             self._precision = gpx.precision   # nat grid ref precision
         else:
             self._precision = precision
+        self._simplifyL = gpx.simplifyL if simplifyL is None else simplifyL # Douglas-Peucker tolerance (m)
+        self._simplifyN = gpx.simplifyN if simplifyN is None else simplifyN # Visvalingam-Whyatt way-point count
         self.mxDeltaL = maxDeltaL  # way-point length delta trigger (m)
         self.mxDeltaV = maxDeltaV  # way-point height delta trigger (m)
         self.mxDeltaS = maxDeltaS  # way-point time delta trigger (sec)
@@ -72,25 +122,47 @@ class gpx(object):
         self._timeTags = True   # time tags processed
         self._stats = {}    # summary route statistics
         self._tag = None    # current route way-point element tag used
-        self._wayPts = []   # list of (lat, lon, elev, ts) tuples generated from way-point elements
+        self._track = None  # way-point store, structured array (see trackDtype), one element per way-point
         self._bsvs = []     # list of bsvs
-        self._deltas = []   # list of (deltaL, deltaV, deltaS) tuples generated from way-point elements
         self._time = time   # process time data if present in gpx document
         self._delta = delta
         self._gpxName = None    # gpx document name tag value, if present
         self._gpxDesc = None    # gpx document desc tag value, if present
-        self._importGPX(inputF)
-        self._setWayPts()
-        if self.validData():
-            self._setElevs()
+        self._inputF = inputF
+        self._stream = stream
+        self._cache = (gpx.cache if cache is None else cache) and isinstance(inputF, basestring)
+        self._stages = set()    # processing stages run (see gpx.stages)
+        self._ngrs = {}     # ngr strings for each precision used
+        self._bsvCache = {} # (bsv list, duplicate count, simplified count) for each bsv generation settings used
 
     def validData(self):
         '''
         returns True if valid data present
         '''
-        return not self._wayPts == []
+        self._runStage('parse')
+        return (self._track is not None) and (len(self._track) > 0)
 
-    def genXML(self, pretty = True, bsv = True, track = True, xmlns = None):
+    @property
+    def _wayPts(self):
+        '''
+        list of (lat, lon, elev, ts) tuples (None if missing) view of _track
+        '''
+        self._runStage('parse')
+        if self._track is None:
+            return []
+        return _wayPtTuples(self._track)
+
+    @property
+    def _deltas(self):
+        '''
+        list of (deltaL, deltaV, deltaS) tuples (None if missing) view of _track
+        '''
+        self._runStage('deltas')
+        if self._track is None:
+            return []
+        return _deltaTuples(self._track)
+
+    def genXML(self, pretty = True, bsv = True, track = True, xmlns = None, simplifyL = None, simplifyN = None, outFile = None):
         '''
          return xml document as StringIO instance
          pretty -- generate pretty output (default: True)
@@ -98,13 +170,27 @@ class gpx(object):
          track  -- create track (default) or route gpx document (bsv only)
          xmlns  -- add xmlns attribute to document root (ignore by default)
                    (standard value if True, custom value if text, ignore if False or None)
+         simplifyL -- Douglas-Peucker tolerance (m) for simplifying track (bsv only)
+         simplifyN -- Visvalingam-Whyatt way-point count for simplifying track (bsv only)
+         outFile   -- write xml document to this open file as it is generated (& return outFile instead),
+                      so the xml document is never held in memory
         '''
+        if simplifyL is not None:
+            self._simplifyL = simplifyL
+        if simplifyN is not None:
+            self._simplifyN = simplifyN
         if bsv:
-            return self._genXML(pretty = pretty, track = track, xmlns = xmlns)
+            return self._genXML(pretty = pretty, track = track, xmlns = xmlns, outFile = outFile)
+        elif self._stream:
+            statusErrMsg('warn', 'gpx.genXML()', 'gpx file xml not retained in stream mode, BSV xml generated')
+            return self._genXML(pretty = pretty, track = track, xmlns = xmlns, outFile = outFile)
         else:
+            self._runStage('parse')
+            if self._xml is None:   # way-points loaded from cache file
+                self._importGPX(self._inputF)
             statusErrMsg('info', 'gpx.genXML()', 'track switch ignored for gpx file xml', gpx.quiet)
             xmlDecl = gpx.xmlDecl + '\n'
-            xmlDoc = StringIO()
+            xmlDoc = StringIO() if outFile is None else outFile
             xmlDoc.write(xmlDecl)
             errMsg('>> create xml document from {} way-points...\n'.format(self._stats['nr']), gpx.quiet)
             self._xml.write(xmlDoc, pretty_print = pretty)
@@ -114,6 +200,8 @@ class gpx(object):
         '''
         generate route statistics & return as StringIO instance
         '''
+        for stage in ('deltas', 'elevs'):
+            self._runStage(stage)
         statsDoc = StringIO()
         errMsg('>> create route statistics...\n', gpx.quiet)
         statsDoc.write('GPX way-points processed  :{:6}\n'.format(self._stats['nr']))
@@ -125,6 +213,8 @@ class gpx(object):
         if self._stats['bsvDup'] is not None:
             statsDoc.write('Duplicate BSVs discarded  :{:6}\n'.format(self._stats['bsvDup']))
             statsDoc.write('BSVs retained             :{:6}\n'.format(self._stats['bsvNr']))
+        if self._stats.get('bsvSimple') is not None:
+            statsDoc.write('Simplified BSVs discarded :{:6}\n'.format(self._stats['bsvSimple']))
         statsDoc.write('Distance                  :{:9.2f}km\n'.format(self._stats['dist']))
         statsDoc.write('Max length delta          :{:8.1f}m\n'.format(self._stats['deltaL']))
         if self._stats['deltaV'] is None:
@@ -206,23 +296,37 @@ class gpx(object):
             statsDoc.write('Tolerance L (BSV)         :{:6}m\n'.format(self._tolerL))
             statsDoc.write('Tolerance V (cumulative)  :{:6}m\n'.format(self._tolerV))
             statsDoc.write('Tolerance T (way-point)   :{:6}sec\n'.format(self._tolerT))
+            if self._simplifyL:
+                statsDoc.write('Simplify L (BSV)          :{:6}m\n'.format(self._simplifyL))
+            if self._simplifyN:
+                statsDoc.write('Simplify N (BSV)          :{:6} way-points\n'.format(self._simplifyN))
         return statsDoc
 
-    def genBSV(self, precision = None, tolerL = None):
+    def genBSV(self, precision = None, tolerL = None, simplifyL = None, simplifyN = None, outFile = None):
         '''
         generate BSV records & return as StringIO instance
         precision -- ngr precision (6|8|10)
         tolerL    -- length tolerance (m) for discarding duplicate BSVs
+        simplifyL -- Douglas-Peucker tolerance (m) for simplifying track
+        simplifyN -- Visvalingam-Whyatt way-point count for simplifying track
+        outFile   -- write BSV records to this open file as they are generated (& return outFile instead),
+                     so the BSV records are never held in memory
         '''
         if precision is not None:
             self._precision = precision
         if tolerL is not None:
             self._tolerL = tolerL
-        bsvDoc = StringIO()
-        bsvLst = self._getBSVlst()
-        if self._delta:
-            deltaLst = self._deltas
-        errMsg('>> create {} bsv records...\n'.format(self._stats['bsvNr']), gpx.quiet)
+        if simplifyL is not None:
+            self._simplifyL = simplifyL
+        if simplifyN is not None:
+            self._simplifyN = simplifyN
+        if outFile is None:
+            bsvDoc = StringIO()
+            bsvLst = self._getBSVlst()
+            errMsg('>> create {} bsv records...\n'.format(self._stats['bsvNr']), gpx.quiet)
+        else:   # records written as generated
+            bsvDoc = outFile
+            bsvLst = (self._getWayPtBSV(*record) for record in self._bsvRecords())
         if self._delta:
             bsvDoc.write(gpx.bsvHdrDelta + '\n')
         elif self._time:
@@ -231,16 +335,65 @@ class gpx(object):
             bsvDoc.write(gpx.bsvHdr + '\n')
         for line in bsvLst:
             bsvDoc.write(line +'\n')
+        if outFile is not None:
+            errMsg('>> created {} bsv records\n'.format(self._stats['bsvNr']), gpx.quiet)
         self._bsvDoc = bsvDoc
         return bsvDoc
 
-    def getStats(self):
+    def getStats(self, keys = None):
         '''
         return copy of _stats
+        keys -- only these _stats values (None if not set), eg: ['dist', 'startTs', 'endTs'],
+                running only the stages needed for them (see gpx.statStages)
         '''
-        return self._stats.copy()
+        if keys is None:
+            for stage in ('deltas', 'elevs'):
+                self._runStage(stage)
+            return self._stats.copy()
+        for key in keys:
+            if key in gpx.statStages:
+                self._runStage(gpx.statStages[key])
+        return dict([(key, self._stats.get(key)) for key in keys])
 
     ## private methods
+    def _runStage(self, stage):
+        '''
+        run a processing stage (see gpx.stages), after the stages it requires, unless already run
+        stages beyond parsing are skipped if there is no valid data
+        '''
+        if stage in self._stages:
+            return
+        (method, required) = gpx.stages[stage]
+        for requiredStage in required:
+            self._runStage(requiredStage)
+        self._stages.add(stage)
+        if stage == 'parse' or self.validData():
+            getattr(self, method)()
+
+    def _parse(self):
+        '''
+        parse the gpx file (unless cached) & populate the _track way-point store
+        '''
+        wayPts = self._loadCache() if self._cache else None
+        if wayPts is None and not self._stream:  # otherwise parsed as way-points are read
+            self._importGPX(self._inputF)
+        self._setWayPts(wayPts)
+
+    def _project(self):
+        '''
+        project all _track way-points (OSGB36 eastings/northings) in one pass, kept for later stages
+        '''
+        (self._track['east'], self._track['north']) = wgs2osgbArray(self._track['lat'], self._track['lon'])
+
+    def _ngrList(self):
+        '''
+        return list of _track way-point ngrs at current precision, formatted in one pass on first use
+        '''
+        if self._precision not in self._ngrs:
+            self._runStage('project')
+            self._ngrs[self._precision] = osgb2ngrArray(self._track['east'], self._track['north'], self._precision).tolist()
+        return self._ngrs[self._precision]
+
     def _importGPX(self, inputF):
         '''
         import gpx data from file
@@ -250,18 +403,18 @@ class gpx(object):
         try:
             self._xml = etree.parse(inputF)
         except etree.XMLSyntaxError as e:
-            statusErrMsg('fatal', 'gpx._importGPX()', 'malformed XML: {}'.format(e.error_log))
-            exit(1)
+            if fatalException:  # terminate program (default)
+                statusErrMsg('fatal', 'gpx._importGPX()', 'malformed XML: {}'.format(e.error_log))
+                exit(1)
+            else:   # raise RuntimeError exception
+                statusErrMsg('err', 'gpx._importGPX()', 'malformed XML: {}'.format(e.error_log))
+                raise RuntimeError('crhGPX.gpx._importGPX() -- malformed XML')
         self._root = self._xml.getroot()
-        if self._root.nsmap:    # namespace map (well, dictionary really)
-            self._namespace = str(self._root.nsmap[None])
-        else:   # empty dictionary
-            statusErrMsg('info', 'gpx._importGPX()', 'no namespaces defined in gpx file')
-            self._namespace = ''
-        nsTagTrack = '{' + self._namespace + '}trk'   # for gpx docs describing tracks
-        nsTagRoute = '{' + self._namespace + '}rte'   # for gpx docs describing routes
-        nsTagName = '{' + self._namespace + '}name'
-        nsTagDesc = '{' + self._namespace + '}desc'
+        self._setNamespace(self._root)
+        nsTagTrack = self._nsTag('trk')   # for gpx docs describing tracks
+        nsTagRoute = self._nsTag('rte')   # for gpx docs describing routes
+        nsTagName = self._nsTag('name')
+        nsTagDesc = self._nsTag('desc')
         # retrieve name and description for later use, assume <trk> tag used
         for child in self._root.iterchildren(nsTagTrack):
             for grandchild in child.iterchildren(nsTagName, nsTagDesc):
@@ -282,19 +435,122 @@ class gpx(object):
             errMsg('name2  = {}'.format(self._gpxName))
             errMsg('desc2  = {}'.format(self._gpxDesc))
 
-    def _setWayPts(self):
+    def _setNamespace(self, root):
+        '''
+        set _namespace from the root element (<gpx>), the default namespace or
+        else the root element's own (prefixed, eg: <gpx:gpx>) namespace
+        '''
+        if None in root.nsmap:    # namespace map (well, dictionary really)
+            self._namespace = str(root.nsmap[None])
+        elif etree.QName(root).namespace:
+            self._namespace = str(etree.QName(root).namespace)
+        else:   # no namespace for gpx elements
+            statusErrMsg('info', 'gpx._importGPX()', 'no namespaces defined in gpx file')
+            self._namespace = ''
+
+    def _nsTag(self, tag):
+        '''
+        return tag in Clark notation (ie: {namespace}tag), just tag if no namespace
+        '''
+        return ('{' + self._namespace + '}' + tag) if self._namespace else tag
+
+    def _wayPtElements(self):
+        '''
+        generate the gpx way-point elements, using whichever way-point tag the gpx file uses
+        (_tag set to None if none found)
+        '''
+        if self._stream:
+            for wayPt in self._streamWayPts():
+                yield wayPt
+            return
+        # first determine which way-point tag used in gpx file
+        tagOK = False
+        for tag in gpx.tags:  # try possible tags
+            self._tag = tag
+            nsTag1 = self._nsTag(self._tag)
+            wayPts = self._xml.getiterator(nsTag1)
+            for wayPt in wayPts:    # check if tag found
+                tagOK = True
+                break
+            if tagOK:
+                break
+            else:
+                statusErrMsg('info', 'gpx._setWayPts()', 'no <{}> elements found'.format(self._tag), gpx.quiet)
+        if not tagOK:   # none of tags worked
+            statusErrMsg('error', 'gpx._setWayPts()', 'unable to parse gpx file')
+            self._tag = None
+            return
+        for wayPt in self._xml.getiterator(nsTag1):  # start again
+            yield wayPt
+
+    def _streamWayPts(self):
+        '''
+        generate the gpx way-point elements while parsing the gpx file incrementally,
+        the way-point tag, namespace, name & desc are picked up as they go past
+        & each way-point element is discarded once used, so memory use stays bounded
+        the way-point tag is chosen in gpx.tags order, as in tree mode, so less preferred
+        way-point elements (eg: <rtept> before <trkpt>) are kept until the preferred tag
+        is found (then discarded) or the end of the gpx file is reached (then generated)
+        '''
+        wayPtTags = None
+        fallbackPts = dict([(tag, []) for tag in gpx.tags[1:]])   # less preferred way-point elements kept
+        try:
+            # only the elements needed (in any namespace) generate events
+            for (event, elem) in etree.iterparse(self._inputF, events = ('end',),
+                                                 tag = ['{*}' + tag for tag in gpx.tags + ['trk', 'name', 'desc']]):
+                if wayPtTags is None:   # namespace from root element (already parsed)
+                    self._setNamespace(elem.getroottree().getroot())
+                    wayPtTags = dict([(self._nsTag(tag), tag) for tag in gpx.tags])
+                    (nsTagTrack, nsTagName, nsTagDesc) = (self._nsTag('trk'), self._nsTag('name'), self._nsTag('desc'))
+                if elem.tag in wayPtTags:
+                    tag = wayPtTags[elem.tag]
+                    if self._tag is None and tag == gpx.tags[0]:    # preferred tag, only use this tag from now on
+                        self._tag = tag
+                        for wayPts in fallbackPts.values():
+                            for wayPt in wayPts:
+                                wayPt.getparent().remove(wayPt)
+                        fallbackPts = {}
+                    elif self._tag is None:     # keep, in case no preferred way-points follow
+                        fallbackPts[tag].append(elem)
+                        continue
+                    if tag == self._tag:
+                        yield elem
+                    _discardElement(elem)
+                elif elem.tag in (nsTagName, nsTagDesc) and elem.getparent().tag == nsTagTrack:
+                    if elem.tag == nsTagName:
+                        self._gpxName = elem.text
+                    else:
+                        self._gpxDesc = elem.text
+                elif elem.tag == nsTagTrack:
+                    errMsg('name1  = {}'.format(self._gpxName))
+                    errMsg('desc1  = {}'.format(self._gpxDesc))
+        except etree.XMLSyntaxError as e:
+            if fatalException:  # terminate program (default)
+                statusErrMsg('fatal', 'gpx._streamWayPts()', 'malformed XML: {}'.format(e.error_log))
+                exit(1)
+            else:   # raise RuntimeError exception
+                statusErrMsg('err', 'gpx._streamWayPts()', 'malformed XML: {}'.format(e.error_log))
+                raise RuntimeError('crhGPX.gpx._streamWayPts() -- malformed XML')
+        for tag in gpx.tags[1:]:    # no preferred way-points, use the kept ones (if any)
+            if self._tag is None and fallbackPts[tag]:
+                self._tag = tag
+                for noTag in gpx.tags[:gpx.tags.index(tag)]:
+                    statusErrMsg('info', 'gpx._setWayPts()', 'no <{}> elements found'.format(noTag), gpx.quiet)
+                for wayPt in fallbackPts[tag]:
+                    yield wayPt
+                    _discardElement(wayPt)
+        if self._tag is None:   # none of tags worked
+            for tag in gpx.tags:
+                statusErrMsg('info', 'gpx._setWayPts()', 'no <{}> elements found'.format(tag), gpx.quiet)
+            statusErrMsg('error', 'gpx._setWayPts()', 'unable to parse gpx file')
+
+    def _setWayPts(self, wayPts = None):
         '''
         retrieve all <ele> & <time> (possibly) tag values, lat/lon attributes, convert them to float values,
-        populate the _wayPts list with (lat, lon, elev, ts) tuples 
-        & the deltas list with (deltaL, deltaV, deltaS) tuples
-        '''
-        nsTag1 = '' # way-point tag determined below
-        nsTag2 = '{' + self._namespace + '}ele'
-        nsTag3 = '{' + self._namespace + '}time'
-        nsTag4 = '{' + self._namespace + '}name'
-        nsTag5 = '{' + self._namespace + '}desc'
-        hPrev = ePrev = nPrev = tPrev = secsPrev = pt = discardT = 0
-        deltaV = deltaL = distance = 0.0
+        populate the _track way-point store (eastings/northings & deltas are added by later stages)
+        wayPts -- way-point values already loaded from cache file (see _readWayPts())
+        '''
+        tPrev = discardT = 0
         self._stats['nr'] = 0
         self._stats['deltaL'] = 0.0
         self._stats['deltaV'] = None
@@ -307,7 +563,6 @@ class gpx(object):
         self._stats['endY'] = None
         start = True
         tsCount = 0
-        tagOK = False
         if gpx.verbose:
             if self._time and self._tolerT:
                 errMsg('gpx file way-point time tolerance = {} sec'.format(self._tolerT))
@@ -315,136 +570,259 @@ class gpx(object):
                 errMsg('gpx file way-point time tolerance disabled')
             else:
                 errMsg('gpx file time tags ignored')
-        # first determine which way-point tag used in gpx file
-        for tag in gpx.tags:  # try possible tags
-            self._tag = tag
-            nsTag1 = '{' + self._namespace + '}' + self._tag
-            wayPts = self._xml.getiterator(nsTag1)
-            for wayPt in wayPts:    # check if tag found
-                tagOK = True
-                break
-            if tagOK:
-                break
-            else:
-                statusErrMsg('info', 'gpx._setWayPts()', 'no <{}> elements found'.format(self._tag), gpx.quiet)
-        if not tagOK:   # none of tags worked
-            statusErrMsg('error', 'gpx._setWayPts()', 'unable to parse gpx file')
-            return False
-        wayPts = self._xml.getiterator(nsTag1)  # start again
-        for wayPt in wayPts:    # parse the gpx file
-            self._stats['nr'] += 1
-            lat = float(wayPt.get('lat'))
-            lon = float(wayPt.get('lon'))
-            try:
-                elev = float(wayPt.findtext(nsTag2))
-            except TypeError as te:  # assume no <ele> element
-                elev = None
-            if self._time:
-                try:
-                    ts = decimalSecs.sub('', wayPt.findtext(nsTag3))  # remove decimal part of seconds from time stamp
-                    secs = self._seconds(ts)
-                    if self._tolerT and not start:
-                        deltaT = secs - tPrev
-                        if deltaT >= self._tolerT:
-                            tPrev = secs
-                        else:   # discard reading (time interval too low)
-                            discardT += 1
-                            continue
-                    tsCount += 1
-                except TypeError as te:  # assume no <time> element
-                    ts = None
-                    secs = None
-            else:
-                ts = None
-            self._wayPts.append((lat, lon, elev, ts))
-            ht = elev
-            pt += 1
+        if wayPts is None:
+            wayPts = self._readWayPts()
+            if wayPts is None:  # no way-point elements
+                return False
+            if self._cache:
+                self._saveCache(wayPts)
+        (lats, lons, elevs, utc, tss) = wayPts
+        self._stats['nr'] = len(lats)
+
+        # time stamps as seconds (decimal part of seconds removed from time stamp strings)
+        if self._time:
+            secsLst = [(secs if ok else None) for (secs, ok) in zip((utc.view(np.int64) // 1000000).tolist(), (~np.isnat(utc)).tolist())]
+        else:
+            secsLst = tss = [None]*len(lats)
+        kept = []   # indices of way-points retained
+        for (idx, secs) in enumerate(secsLst):
+            if secs is not None:
+                if self._tolerT and not start:
+                    if secs - tPrev >= self._tolerT:
+                        tPrev = secs
+                    else:   # discard reading (time interval too low)
+                        discardT += 1
+                        continue
+                tsCount += 1
+            kept.append(idx)
             if start:
-                self._stats['startTs'] = ts
+                self._stats['startTs'] = tss[idx]
                 start = False
             else:
-                self._stats['endTs'] = ts
-            # generate way-point deltas & route length as well
-            (east, north) = wgs2osgb(lat, lon)
-            if (ePrev == 0) and (nPrev == 0):   # first value
-                self._stats['startX'] = east
-                self._stats['startY'] = north
-                ePrev = east
-                nPrev = north
-                hPrev = ht
-                secsPrev = secs
-                if gpx.verbose and self._delta:
-                    if (ht is None) and (ts is None):
-                        errMsg('way-point {:5.0f}: deltaL {:5.1f}m'.format(pt, 0.0))
-                    elif ht is None:
-                        errMsg('way-point {:5.0f}: deltaL {:5.1f}m, deltaS {:4.0f}sec'.format(pt, 0.0, 0.0))
-                    elif ts is None:
-                        errMsg('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}m'.format(pt, 0.0, 0.0))
-                    else:
-                        errMsg('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}m, deltaS {:4.0f}'.format(pt, 0.0, 0.0, 0.0))
-                self._deltas.append((None, None, None))
-                continue
-            self._stats['endX'] = east
-            self._stats['endY'] = north
-            deltaL = sqrt(1.0 * ((east - ePrev)**2 + (north - nPrev)**2))
-            if not ((ht is None) and (hPrev is None)):
-                deltaV = round(ht - hPrev, 1)
-                if self._stats['deltaV'] is None:
-                    self._stats['deltaV'] = deltaV
-                elif (abs(deltaV) > abs(self._stats['deltaV'])): 
-                    self._stats['deltaV'] = deltaV
-            else:
-                deltaV = None
-            if not ((secs is None) and (secsPrev is None)):
-                deltaS = secs - secsPrev
-                if self._stats['deltaS'] is None:
-                    self._stats['deltaS'] = deltaS
-                elif (deltaS > self._stats['deltaS']): 
-                    self._stats['deltaS'] = deltaS
-            else:
-                deltaS = None
-            distance += deltaL
-            deltaL = round(deltaL, 1)
-            if deltaL > self._stats['deltaL']:
-                self._stats['deltaL'] = deltaL
-            ePrev = east
-            nPrev = north
-            hPrev = ht
-            secsPrev = secs
-            self._deltas.append((deltaL, deltaV, deltaS))
-            if gpx.verbose and self._delta:
-                if (deltaV is None) and (deltaS is None):
-                    errMsg('way-point {:5.0f}: deltaL={:5.1f}m'.format(pt, deltaL))
-                elif deltaV is None:
-                    errMsg('way-point {:5.0f}: deltaL {:5.1f}m, deltaS {:4.0f}sec'.format(pt, deltaL, deltaS))
-                elif deltaS is None:
-                    errMsg('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}sec'.format(pt, deltaL, deltaV))
-                else:
-                    errMsg('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}m, deltaS {:4.0f}sec'.format(pt, deltaL, deltaV, deltaS))
-            # highlight potential delta errors
-            if deltaL > self.mxDeltaL:
-                statusErrMsg('warn', 'gpx._setWayPts()', 'way-point {:5} generating large delta length ({}m, {}m)'.format(pt, int(deltaL), int(distance)))
-            if (deltaV is not None) and (abs(deltaV) > self.mxDeltaV):
-                statusErrMsg('warn', 'gpx._setWayPts()', 'way-point {:5} generating large delta height ({:+2}m, {}m)'.format(pt, int(deltaV), int(elev)))
-            if (deltaS is not None) and (deltaS > self.mxDeltaS):
-                statusErrMsg('info', 'gpx._setWayPts()', 'way-point {:5} generating large delta time ({}sec, {})'.format(pt, int(deltaS), ts))
+                self._stats['endTs'] = tss[idx]
+        if discardT:
+            (lats, lons, elevs) = (lats[kept], lons[kept], elevs[kept])
+            (tss, secsLst) = ([tss[idx] for idx in kept], [secsLst[idx] for idx in kept])
 
+        self._setTrack(lats, lons, elevs, tss, secsLst)
         if self._tolerT:
             self._stats['discardT'] = discardT
-        self._stats['dist'] = round(distance / 1000.0, 2)
-        if self._wayPts == []:  # should not be triggered
-            statusErrMsg('fatal', 'gpx._setWayPts()', 'no <{}> elements found'.format(self._tag))
-            exit(1)
+        if not self.validData():  # should not be triggered
+            if fatalException:  # terminate program (default)
+                statusErrMsg('fatal', 'gpx._setWayPts()', 'no <{}> elements found'.format(self._tag))
+                exit(1)
+            else:   # raise RuntimeError exception
+                statusErrMsg('err', 'gpx._setWayPts()', 'no <{}> elements found'.format(self._tag))
+                raise RuntimeError('crhGPX.gpx._setWayPts() -- no way-points')
         elif self._time and (tsCount == 0):
             statusErrMsg('warn', 'gpx._setWayPts()', 'no <time> elements found')
             self._timeTags = False
             return False
         return True
 
-    def _getWayPtBSV(self, wayPt, deltas = None):
+    def _readWayPts(self):
+        '''
+        parse the gpx file (see _importGPX()), retrieving all way-point values in one sweep
+        return (lats, lons, elevs, utc, tss) tuple, all way-points, NaN/NaT where missing,
+        (utc, tss time stamp values only if required), or None if no way-points
+        '''
+        nsTag2 = nsTag3 = None  # set once namespace known (after parsing starts in stream mode)
+        (lats, lons, elevs, times) = ([], [], [], [])  # text values of all way-points
+        for wayPt in self._wayPtElements():    # parse the gpx file, one pass over each way-point's children
+            if nsTag2 is None:
+                nsTag2 = self._nsTag('ele')
+                nsTag3 = self._nsTag('time')
+            elev = ts = None    # assume no <ele> or <time> element
+            for child in wayPt:
+                if child.tag == nsTag2:
+                    elev = child.text
+                elif child.tag == nsTag3:
+                    ts = child.text
+            lats.append(wayPt.get('lat'))
+            lons.append(wayPt.get('lon'))
+            elevs.append(elev)
+            times.append(ts)
+        if self._tag is None:   # no way-point elements
+            return None
+        # convert all values in one pass, missing elevations are NaN
+        lats = np.array(lats, dtype = 'S').astype(np.float64)
+        lons = np.array(lons, dtype = 'S').astype(np.float64)
+        elevs = np.array([(elev if elev is not None else 'nan') for elev in elevs], dtype = 'S').astype(np.float64)
+        (utc, tss) = _isoParse(times) if (self._time or self._cache) else (None, None)
+        return (lats, lons, elevs, utc, tss)
+
+    def _cacheFile(self):
+        '''
+        return cache file name for the gpx file
+        '''
+        if gpx.cacheDir is None:
+            return self._inputF + '.npz'
+        fileKey = hashlib.sha1(os.path.abspath(self._inputF)).hexdigest()[:12]   # same names in different directories
+        return os.path.join(gpx.cacheDir, '{}-{}.npz'.format(os.path.basename(self._inputF), fileKey))
+
+    def _cacheKey(self, hashed = True):
+        '''
+        return dictionary identifying the gpx file contents, its path, size, modification time & content hash
+        hashed -- include the content hash (reads the whole file)
+        '''
+        fileStat = os.stat(self._inputF)
+        fileKey = {'version': gpx.cacheVersion, 'path': os.path.abspath(self._inputF), 'size': fileStat.st_size,
+                   'mtime': fileStat.st_mtime}
+        if hashed:
+            contentHash = hashlib.md5()
+            with open(self._inputF, 'rb') as inFile:
+                for block in iter(lambda: inFile.read(1024*1024), ''):
+                    contentHash.update(block)
+            fileKey['md5'] = contentHash.hexdigest()
+        return fileKey
+
+    def _loadCache(self):
+        '''
+        load way-point values (see _readWayPts()) from cache file, if present & valid for gpx file,
+        return None otherwise
+        (projections are not cached, see _saveCache())
+        '''
+        cacheF = self._cacheFile()
+        if not os.path.exists(cacheF):
+            return None
+        try:
+            cached = np.load(cacheF)
+            try:
+                meta = json.loads(str(cached['meta']))
+                fileKey = self._cacheKey(hashed = False)  # cheap checks before hashing the contents
+                if all([meta.get(key) == fileKey[key] for key in fileKey]):
+                    fileKey = self._cacheKey()
+                if any([meta.get(key) != fileKey[key] for key in fileKey]) or 'md5' not in fileKey:
+                    statusErrMsg('info', 'gpx._loadCache()', 'cache file out of date: {}'.format(cacheF), gpx.quiet)
+                    return None
+                wayPts = tuple([cached[name] for name in ('lat', 'lon', 'elev', 'utc', 'ts')])
+            finally:
+                cached.close()
+        except (IOError, ValueError, KeyError, zipfile.BadZipfile) as e:
+            statusErrMsg('warn', 'gpx._loadCache()', 'unable to load cache file {}: {}'.format(cacheF, e))
+            return None
+        (self._tag, self._namespace) = (str(meta['tag']), str(meta['namespace']))
+        (self._gpxName, self._gpxDesc) = (_jsonText(meta['name']), _jsonText(meta['desc']))
+        statusErrMsg('info', 'gpx._loadCache()', '{} way-points loaded from cache file'.format(len(wayPts[0])), gpx.quiet)
+        (lats, lons, elevs, utc, tss) = wayPts
+        return (lats, lons, elevs, utc.view('datetime64[us]'), [(ts or None) for ts in tss.tolist()])
+
+    def _saveCache(self, wayPts):
+        '''
+        save way-point values (see _readWayPts()) in cache file
+        eastings/northings are deliberately not cached, as the transformation (osgbTransformer)
+        can change (eg: setGridShift()) without the gpx file changing, so they are projected
+        afresh on each load (cheap, see _project())
+        '''
+        (lats, lons, elevs, utc, tss) = wayPts
+        cacheF = self._cacheFile()
+        meta = self._cacheKey()
+        meta.update({'tag': self._tag, 'namespace': self._namespace, 'name': self._gpxName, 'desc': self._gpxDesc})
+        try:
+            with open(cacheF + '.tmp', 'wb') as cacheFile:   # renamed once complete
+                np.savez(cacheFile, meta = np.array(json.dumps(meta)), lat = lats, lon = lons, elev = elevs,
+                         utc = utc.view(np.int64), ts = np.array([(ts or '') for ts in tss], dtype = 'S'))
+            os.rename(cacheF + '.tmp', cacheF)
+        except (IOError, OSError) as e:
+            statusErrMsg('warn', 'gpx._saveCache()', 'unable to save cache file {}: {}'.format(cacheF, e))
+
+    def _setTrack(self, lats, lons, elevs, tss, secsLst):
+        '''
+        create the _track way-point store from arrays/lists of way-point values (None or NaN if missing)
+        '''
+        tsLen = max([len(ts) for ts in tss if ts] or [1])
+        self._track = np.zeros(len(lats), dtype = gpx.trackDtype + [('ts', 'S{}'.format(tsLen))])
+        self._track['lat'] = lats
+        self._track['lon'] = lons
+        self._track['elev'] = np.array(elevs, dtype = np.float64)    # None becomes NaN
+        self._track['secs'] = np.array(secsLst, dtype = np.float64)
+        self._track['ts'] = [ts or '' for ts in tss]
+        self._track['deltaL'] = self._track['deltaV'] = self._track['deltaS'] = np.nan
+
+    def _setDeltas(self):
+        '''
+        calculate the _track (deltaL, deltaV, deltaS) deltas, the route length & max delta stats
+        from the way-point store as whole arrays, & report large deltas
+        deltas are stored unrounded (the _deltas view rounds them as before)
+        '''
+        track = self._track
+        self._stats['startX'] = int(track['east'][0])
+        self._stats['startY'] = int(track['north'][0])
+        if len(track) > 1:
+            self._stats['endX'] = int(track['east'][-1])
+            self._stats['endY'] = int(track['north'][-1])
+        dE = np.diff(track['east'])
+        dN = np.diff(track['north'])
+        deltaL = np.sqrt((dE*dE + dN*dN).astype(np.float64))
+        deltaV = np.diff(track['elev'])  # NaN if either elevation missing
+        deltaS = np.diff(track['secs'])
+        (track['deltaL'][1:], track['deltaV'][1:], track['deltaS'][1:]) = (deltaL, deltaV, deltaS)
+        distance = np.cumsum(deltaL)    # accumulated in order, as a running total would be
+        self._stats['dist'] = round(float(distance[-1]) / 1000.0, 2) if len(distance) else 0.0
+
+        # max deltas -- rounded values compare as the (monotonic) unrounded values do, but rounding can
+        # create ties, so only values within rounding distance of the max are rounded (as round() does)
+        self._stats['deltaL'] = max(0.0, round(float(deltaL.max()), 1)) if len(deltaL) else 0.0
+        validV = ~np.isnan(deltaV)
+        if validV.any():
+            near = np.flatnonzero(validV & (np.abs(np.where(validV, deltaV, 0.0)) >= np.nanmax(np.abs(deltaV)) - 0.11))
+            rounded = [round(value, 1) for value in deltaV[near].tolist()]
+            self._stats['deltaV'] = rounded[int(np.argmax(np.abs(rounded)))]   # first of any ties
+        validS = ~np.isnan(deltaS)
+        if validS.any():
+            self._stats['deltaS'] = int(np.nanmax(deltaS))
+
+        # report large deltas (& all deltas if verbose) in way-point order
+        msgs = []   # (way-point index, order, status, message) tuples
+        for idx in np.flatnonzero(deltaL > self.mxDeltaL - 0.11).tolist():
+            if round(deltaL[idx], 1) > self.mxDeltaL:
+                msgs.append((idx + 1, 1, 'warn', 'way-point {:5} generating large delta length ({}m, {}m)'.format(
+                             idx + 2, int(round(deltaL[idx], 1)), int(distance[idx]))))
+        for idx in np.flatnonzero(validV & (np.abs(np.where(validV, deltaV, 0.0)) > self.mxDeltaV - 0.11)).tolist():
+            if abs(round(deltaV[idx], 1)) > self.mxDeltaV:
+                msgs.append((idx + 1, 2, 'warn', 'way-point {:5} generating large delta height ({:+2}m, {}m)'.format(
+                             idx + 2, int(round(deltaV[idx], 1)), int(track['elev'][idx + 1]))))
+        for idx in np.flatnonzero(validS & (np.where(validS, deltaS, 0.0) > self.mxDeltaS)).tolist():
+            msgs.append((idx + 1, 3, 'info', 'way-point {:5} generating large delta time ({}sec, {})'.format(
+                         idx + 2, int(deltaS[idx]), track['ts'][idx + 1])))
+        if gpx.verbose and self._delta:
+            msgs.extend([(idx, 0, None, msg) for (idx, msg) in enumerate(self._deltaMsgs())])
+        for (idx, order, status, msg) in sorted(msgs):
+            if status is None:
+                errMsg(msg)
+            else:
+                statusErrMsg(status, 'gpx._setWayPts()', msg)
+
+    def _deltaMsgs(self):
+        '''
+        return list of verbose delta messages, one per way-point
+        '''
+        msgs = []
+        for (pt, (lat, lon, elev, ts), (deltaL, deltaV, deltaS)) in zip(range(1, len(self._track) + 1), self._wayPts, self._deltas):
+            if pt == 1: # first value
+                if (elev is None) and (ts is None):
+                    msgs.append('way-point {:5.0f}: deltaL {:5.1f}m'.format(pt, 0.0))
+                elif elev is None:
+                    msgs.append('way-point {:5.0f}: deltaL {:5.1f}m, deltaS {:4.0f}sec'.format(pt, 0.0, 0.0))
+                elif ts is None:
+                    msgs.append('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}m'.format(pt, 0.0, 0.0))
+                else:
+                    msgs.append('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}m, deltaS {:4.0f}'.format(pt, 0.0, 0.0, 0.0))
+            elif (deltaV is None) and (deltaS is None):
+                msgs.append('way-point {:5.0f}: deltaL={:5.1f}m'.format(pt, deltaL))
+            elif deltaV is None:
+                msgs.append('way-point {:5.0f}: deltaL {:5.1f}m, deltaS {:4.0f}sec'.format(pt, deltaL, deltaS))
+            elif deltaS is None:
+                msgs.append('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}sec'.format(pt, deltaL, deltaV))
+            else:
+                msgs.append('way-point {:5.0f}: deltaL {:5.1f}m, deltaV {:+7.1f}m, deltaS {:4.0f}sec'.format(pt, deltaL, deltaV, deltaS))
+        return msgs
+
+    def _getWayPtBSV(self, wayPt, eastNorth, ngr, deltas = None):
         '''
         wayPt     -- way-point data tuple (lat, lon, elev  ts)
-        precision -- ngr precision (6|8|10 digits)
+        eastNorth -- way-point OSGB36 (east, north) tuple
+        ngr       -- way-point ngr
         deltas    -- delta value information tuple, or None
         calculate & return a bsv record for a wayPt
         '''
@@ -453,8 +831,7 @@ class gpx(object):
             (deltaL, deltaV, deltaS) = deltas
         else:
             (deltaL, deltaV) = (None, None)
-        (east, north) = wgs2osgb(lat, lon)
-        ngr = osgb2ngr((east, north), self._precision)
+        (east, north) = eastNorth
         if (elev is None) and self._time and (ts is None):
             bsvRcd = '{:+010.5f}|{:+010.5f}|||{}|{}|{}'.format(lat, lon, east, north, ngr)
         elif (elev is None) and time:
@@ -481,47 +858,124 @@ class gpx(object):
 
     def _getBSVlst(self):
         '''
-        generate & return list of BSV records from document
+        generate & return list of BSV records from document (see _bsvRecords()),
+        lists are kept for reuse with the same settings
+        '''
+        key = self._bsvSettings()
+        if key in self._bsvCache:    # already generated
+            self._bsvMsgs(key)
+            (bsvLst, dupCount, simpleCount) = self._bsvCache[key]
+            self._setBSVstats(key, dupCount, simpleCount)
+        else:
+            bsvLst = [self._getWayPtBSV(*record) for record in self._bsvRecords(self._ngrList())]
+            self._bsvCache[key] = (bsvLst, self._stats['bsvDup'] or 0, self._stats.get('bsvSimple') or 0)
+        self._bsvs = bsvLst[:]
+        return bsvLst[:]
+
+    def _bsvRecords(self, ngrs = None, chunkSize = 10000):
+        '''
+        generate (wayPt, eastNorth, ngr, deltas) BSV record values (see _getWayPtBSV()) from document,
+        a chunk of _track way-points at a time, & set the BSV _stats once all generated
+        ngrs      -- list of all _track way-point ngrs at current precision (formatted a chunk at a time if None,
+                     not required if False)
         precision -- ngr precision (6|8|10 digits, giving 100|10|1m precision)
         tolerL    -- length tolerance (m) for discarding duplicate readings
         '''
-        tolerL = self._tolerL   # might need to temporarily set tolerL to 0
+        key = self._bsvSettings()
+        (precision, tolerL, simplifyL, simplifyN) = key # might need to temporarily set tolerL to 0
         prevEastNorth = (1, 1)  # suitable nonsense initial value
         dupCount = 0
-        bsvLst = []
-        if self._delta and tolerL:
+        self._bsvMsgs(key)
+        self._runStage('deltas' if self._delta else 'project')
+        retained = self._simplify(simplifyL, simplifyN)
+        for start in range(0, len(self._track), chunkSize):
+            chunk = self._track[start:start + chunkSize]
+            wayPts = _wayPtTuples(chunk)
+            eastNorths = zip(chunk['east'].tolist(), chunk['north'].tolist())
+            if ngrs is None:
+                chunkNgrs = osgb2ngrArray(chunk['east'], chunk['north'], precision).tolist()
+            elif ngrs is False:
+                chunkNgrs = [None]*len(chunk)
+            else:
+                chunkNgrs = ngrs[start:start + chunkSize]
+            deltas = _deltaTuples(chunk) if self._delta else [None]*len(chunk)
+            for (keep, wayPt, eastNorth, ngr, delta) in zip(retained[start:start + chunkSize].tolist(), wayPts, eastNorths, chunkNgrs, deltas):
+                if not keep:   # discarded by simplification
+                    continue
+                elif self._delta:
+                    yield (wayPt, eastNorth, ngr, delta)
+                elif tolerL:
+                    (east, north) = eastNorth
+                    if abs(east - prevEastNorth[0]) + abs(north - prevEastNorth[1]) > tolerL:
+                        yield (wayPt, eastNorth, ngr, None)
+                        prevEastNorth = tuple([east, north])
+                    else:   # discard (near) duplicate bsv record
+                        dupCount += 1
+                        continue
+                else:
+                    yield (wayPt, eastNorth, ngr, None)
+        self._setBSVstats(key, dupCount, len(retained) - int(retained.sum()))
+
+    def _bsvMsgs(self, key):
+        '''
+        output messages about the BSV record settings
+        '''
+        (precision, tolerL, simplifyL, simplifyN) = key
+        if self._delta and self._tolerL:
             statusErrMsg('warn', 'gpx._getBSVlst()', 'length tolerance mode disabled')
-            tolerL = 0  # _tolerL not affected :-)
+        if self._delta and (self._simplifyL or self._simplifyN):
+            statusErrMsg('warn', 'gpx._getBSVlst()', 'simplification mode disabled')
         if gpx.verbose:
             if tolerL:
-                errMsg('bsv ngr precision = {}; bsv length tolerance = {}m'.format(self._precision, tolerL))
-            else:
-                errMsg('bsv ngr precision = {}; bsv length tolerance disabled'.format(self._precision))
-        for idx in range(0, len(self._wayPts)):
-            if self._delta:
-                bsvLst.append(self._getWayPtBSV(self._wayPts[idx], self._deltas[idx]))
-            elif tolerL:
-                (lat, lon, elev, ts) = self._wayPts[idx]
-                (east, north) = wgs2osgb(lat, lon)
-                if abs(east - prevEastNorth[0]) + abs(north - prevEastNorth[1]) > tolerL:
-                    bsvLst.append(self._getWayPtBSV(self._wayPts[idx]))
-                    prevEastNorth = tuple([east, north])
-                else:   # discard (near) duplicate bsv record
-                    dupCount += 1
-                    continue
+                errMsg('bsv ngr precision = {}; bsv length tolerance = {}m'.format(precision, tolerL))
             else:
-                bsvLst.append(self._getWayPtBSV(self._wayPts[idx]))
+                errMsg('bsv ngr precision = {}; bsv length tolerance disabled'.format(precision))
+            if simplifyL or simplifyN:
+                errMsg('bsv simplification tolerance = {}m; bsv simplification way-points = {}'.format(simplifyL, simplifyN))
+
+    def _setBSVstats(self, key, dupCount, simpleCount):
+        '''
+        set BSV record _stats (& output messages)
+        '''
+        (precision, tolerL, simplifyL, simplifyN) = key
+        if simplifyL or simplifyN:
+            statusErrMsg('info', 'gpx._getBSVlst()', '{} bsv records discarded by simplification'.format(simpleCount), gpx.quiet)
+            self._stats['bsvSimple'] = simpleCount
+        else:
+            self._stats.pop('bsvSimple', None)
         if tolerL:
             statusErrMsg('info', 'gpx._getBSVlst()', '{} duplicate bsv records discarded)'.format(dupCount), gpx.quiet)
             self._stats['bsvDup'] = dupCount
-            self._stats['bsvNr'] = self._stats['nr'] - self._stats['discardT'] - dupCount
+            self._stats['bsvNr'] = self._stats['nr'] - self._stats.get('discardT', 0) - dupCount - simpleCount   # none if time tolerance disabled
         else:
             self._stats['bsvDup'] = None
-            self._stats['bsvNr'] = self._stats['nr']
+            self._stats['bsvNr'] = self._stats['nr'] - simpleCount
 
-        self._bsvs = bsvLst[:]
-        return bsvLst
+    def _bsvSettings(self):
+        '''
+        return (precision, tolerL, simplifyL, simplifyN) settings for generating BSV records,
+        length tolerance & simplification are disabled in delta mode (deltas are between gpx way-points)
+        '''
+        if self._delta:
+            return (self._precision, 0, 0, 0)   # _tolerL, etc not affected :-)
+        return (self._precision, self._tolerL, self._simplifyL, self._simplifyN)
         
+    def _simplify(self, simplifyL, simplifyN):
+        '''
+        simplify the _track way-points in OSGB36 coordinates, Douglas-Peucker (simplifyL tolerance, m)
+        then Visvalingam-Whyatt (simplifyN way-points), 0 disables either
+        return boolean numpy array, True for way-points retained
+        '''
+        if not (simplifyL or simplifyN):
+            return np.ones(len(self._track), dtype = bool)
+        self._runStage('project')
+        (east, north) = (self._track['east'], self._track['north'])
+        keep = simplifyDP(east, north, simplifyL) if simplifyL else np.ones(len(east), dtype = bool)
+        if simplifyN:
+            kept = np.flatnonzero(keep)
+            keep[kept[~simplifyVW(east[kept], north[kept], simplifyN)]] = False
+        return keep
+
     def _setElevs(self):
         '''
         retrieve all <ele> tag values, convert them to float values & set _stats
@@ -537,47 +991,30 @@ class gpx(object):
         self._stats['dnAbs'] = 0.0
         if 'bsvDup' not in self._stats:
             self._stats['bsvDup'] = None
-        prevElev = None
         if gpx.verbose:
             if self._tolerV:
                 errMsg('gpx vertical tolerance = {}m'.format(self._tolerV))
             else:
                 errMsg('height tolerance mode disabled')
-        for wayPt in self._wayPts:
-            elev = wayPt[2]
-            if elev is None:
-                print ' elev is None'
-                noneCount += 1
-                continue
-            if prevElev is None:    # first value
-                self._stats['hi'] = elev
-                self._stats['lo'] = elev
-                self._stats['start'] = elev
-                prevElev = elev
-                prevElevAbs = elev
-            else:
-                deltaV = elev - prevElev
-                deltaVAbs = elev -prevElevAbs
-#                errMsg('prevElev, elev, upAbs, dnAbs, deltaV = {}, {}, {}, {}, {}'.format(prevElev, elev, self._stats['upAbs'], self._stats['dnAbs'], deltaV))
-                if deltaVAbs > 0:
-                    self._stats['upAbs'] += deltaVAbs
-                elif deltaVAbs < 0:
-                    self._stats['dnAbs'] -= deltaVAbs
-                prevElevAbs = elev
-                if self._stats['hi'] < elev:
-                    self._stats['hi'] = elev
-                elif self._stats['lo'] > elev:
-                    self._stats['lo'] = elev
-                if deltaV > self._tolerV:
-                    self._stats['up'] += deltaV
-                    prevElev = elev
-                elif deltaV < - self._tolerV:
-                    self._stats['dn'] -= deltaV
-                    prevElev = elev
-                elif deltaV != 0:
-                    ignoreCount += 1
-                
-            self._stats['end'] = elev
+        elevs = self._track['elev']
+        elevs = elevs[~np.isnan(elevs)]
+        noneCount = len(self._track) - len(elevs)
+        if 0 < noneCount < len(self._track):   # (none at all reported below)
+            statusErrMsg('info', 'gpx._setElevs()', '{} way-points without <ele> elements'.format(noneCount), gpx.quiet)
+        if len(elevs):
+            self._stats['start'] = float(elevs[0])
+            self._stats['end'] = float(elevs[-1])
+            self._stats['hi'] = float(elevs.max())
+            self._stats['lo'] = float(elevs.min())
+            deltaV = np.diff(elevs)
+            ups = np.cumsum(deltaV[deltaV > 0])  # running totals, accumulated in order as before
+            dns = np.cumsum(deltaV[deltaV < 0])
+            self._stats['upAbs'] = float(ups[-1]) if len(ups) else 0.0
+            self._stats['dnAbs'] = - float(dns[-1]) if len(dns) else 0.0
+            if self._tolerV:
+                (self._stats['up'], self._stats['dn'], ignoreCount) = _heightChanges(elevs.tolist(), self._tolerV)
+            else:   # every change counted
+                (self._stats['up'], self._stats['dn']) = (self._stats['upAbs'], self._stats['dnAbs'])
         if noneCount == self._stats['nr']:  # no elevations
             statusErrMsg('warn', 'gpx._setElevs()', 'no <ele> elements present', gpx.quiet)
             self._stats['up'] = None
@@ -593,57 +1030,79 @@ class gpx(object):
             self._stats['upAbs'] = int(round(self._stats['upAbs'], 0))
             self._stats['dnAbs'] = int(round(self._stats['dnAbs'], 0))
 
-    def _genXML(self, pretty = True, track = True, xmlns = None):
+    def _genXML(self, pretty = True, track = True, xmlns = None, outFile = None):
         '''
-         return xml document based on BSV data as StringIO instance
-         pretty -- generate pretty output (default: True)
-         track  -- create track (default) or route gpx document
-         xmlns  -- add xmlns attribute to document root
+         return xml document based on BSV data as StringIO instance (or outFile)
+         pretty  -- generate pretty output (default: True)
+         track   -- create track (default) or route gpx document
+         xmlns   -- add xmlns attribute to document root
+         outFile -- open file to write to, instead of a StringIO instance
+        the document is written incrementally (see etree.xmlfile), a BSV record at a time
         '''
         if gpx.verbose:
             if track:
                 errMsg('generate track gpx document from BSVs')
             else:
                 errMsg('generate route gpx document from BSVs')
+        self._runStage('parse')    # for name & desc
         xmlDecl = gpx.xmlDecl + '\n'
         if (xmlns is None) or (xmlns is False): # ignore
-            gpxBSV = etree.Element('gpx', version = '1.0', creator = 'crhGPX')
+            attributes = [('creator', 'crhGPX'), ('version', '1.0')]
         elif xmlns is True: # standard value
-            gpxBSV = etree.Element( 'gpx', xmlns = gpx.xmlNamespace, version = '1.0', creator = 'crhGPX')
+            attributes = [('creator', 'crhGPX'), ('version', '1.0'), ('xmlns', gpx.xmlNamespace)]
         else:   # custom text
-            gpxBSV = etree.Element( 'gpx', xmlns = xmlns, version = '1.0', creator = 'crhGPX')
-        xmlDoc = etree.ElementTree(gpxBSV)
-        if track:
-            trkRte = etree.SubElement(gpxBSV, 'trk')
-        else:
-            trkRte = etree.SubElement(gpxBSV, 'rte')
-        if hasattr(self, '_gpxName') and self._gpxName is not None:
-            trkRteName =etree.SubElement(trkRte, 'name')
-            trkRteName.text = self._gpxName
-        if hasattr(self, '_gpxDesc') and self._gpxDesc is not None:
-            trkRteDesc =etree.SubElement(trkRte, 'desc')
-            trkRteDesc.text = self._gpxDesc
-        if track:
-            segment = etree.SubElement(trkRte, 'trkseg')
-        if len(self._bsvs):
-            bsvLst = self._bsvs[:]
-        else:
-            bsvLst = self._getBSVlst()
-        for bsv in bsvLst:
-            bsvFlds = bsv.split('|')
-            if track:
-                point = etree.SubElement(segment, 'trkpt', lat = bsvFlds[0], lon = bsvFlds[1])
-            else:
-                point = etree.SubElement(trkRte, 'rtept', lat = bsvFlds[0], lon = bsvFlds[1])
-            elevation = etree.SubElement(point, 'ele')
-            elevation.text = bsvFlds[2]
-            if track and self._time and (bsvFlds[3] != ''):
-                time = etree.SubElement(point, 'time')
-                time.text = bsvFlds[3]
-        doc = StringIO()
+            attributes = [('creator', 'crhGPX'), ('version', '1.0'), ('xmlns', xmlns)]
+        records = (_xmlFields(wayPt) for (wayPt, eastNorth, ngr, deltas) in self._bsvRecords(ngrs = False))
+        doc = StringIO() if outFile is None else outFile
         doc.write(xmlDecl)
-        errMsg('>> create gpx document from {} BSVs...\n'.format(len(bsvLst)), gpx.quiet)
-        xmlDoc.write(doc, pretty_print = pretty)
+        with etree.xmlfile(doc, encoding = 'ASCII') as xmlDoc:
+
+            def indent(level):
+                '''
+                start a new (pretty) line, indented to level
+                '''
+                if pretty:
+                    xmlDoc.write('\n' + '  '*level)
+
+            def writeWayPts(level):
+                '''
+                write a way-point element, indented to level, for each BSV record, return number written
+                '''
+                count = 0
+                for (lat, lon, elev, ts) in records:
+                    count += 1
+                    indent(level)
+                    with xmlDoc.element('trkpt' if track else 'rtept', OrderedDict([('lat', lat), ('lon', lon)])):
+                        indent(level + 1)
+                        with xmlDoc.element('ele'):
+                            xmlDoc.write(elev)
+                        if track and self._time and (ts != ''):
+                            indent(level + 1)
+                            with xmlDoc.element('time'):
+                                xmlDoc.write(ts)
+                        indent(level)
+                return count
+
+            with xmlDoc.element('gpx', OrderedDict(attributes)):
+                indent(1)
+                with xmlDoc.element('trk' if track else 'rte'):
+                    for (tag, text) in (('name', self._gpxName), ('desc', self._gpxDesc)):
+                        if text is not None:
+                            indent(2)
+                            with xmlDoc.element(tag):
+                                xmlDoc.write(text)
+                    if track:
+                        indent(2)
+                        with xmlDoc.element('trkseg'):
+                            count = writeWayPts(3)
+                            indent(2)
+                    else:
+                        count = writeWayPts(2)
+                    indent(1)
+                indent(0)
+        if pretty:
+            doc.write('\n')
+        errMsg('>> create gpx document from {} BSVs...\n'.format(count), gpx.quiet)
         return doc
 
     def _seconds(self, gpxTime):
@@ -651,22 +1110,296 @@ class gpx(object):
         gpxTime -- gpx <time> element string
         return time in seconds (integer) for comparative purposes, etc
         '''
-        ts = gpxTime[:19]  # remove end of string beyond seconds digits
-        ts = ts.replace('T', ' ')
-        ts = datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
-        return int(time.mktime(ts.timetuple()))
+        return int(isoTime(gpxTime) // 1)
         
+# timestamp functions
+
+def isoTime(text):
+    '''
+    convert ISO 8601 (gpx <time>) time stamp to UTC epoch seconds (float, incl. fractional seconds)
+    eg: '2015-06-08T09:39:52.9531659+01:00' >> 1433752792.9531659
+    Z, +hh:mm & -hh:mm offsets handled (none is taken as UTC), raises ValueError if malformed
+    '''
+    prefix = text[:13]  # date & hour, usually repeated
+    try:
+        secs = _isoPrefixes[prefix]
+    except KeyError:
+        if len(prefix) < 13 or prefix[4] != '-' or prefix[7] != '-' or prefix[10] not in 'T ':
+            raise ValueError('invalid time stamp: {}'.format(text))
+        (year, month, day, hour) = (int(prefix[:4]), int(prefix[5:7]), int(prefix[8:10]), int(prefix[11:13]))
+        datetime.datetime(year, month, day, hour)   # validate
+        secs = calendar.timegm((year, month, day, hour, 0, 0))
+        if len(_isoPrefixes) >= _isoPrefixesMax:
+            _isoPrefixes.clear()
+        _isoPrefixes[prefix] = secs
+    tail = isoTail.match(text[19:])
+    if text[13:14] != ':' or text[16:17] != ':' or not (text[14:16] + text[17:19]).isdigit() or tail is None:
+        raise ValueError('invalid time stamp: {}'.format(text))
+    (minute, second) = (int(text[14:16]), int(text[17:19]))
+    if minute > 59 or second > 59:
+        raise ValueError('invalid time stamp: {}'.format(text))
+    secs += minute*60 + second
+    if tail.group(3):   # offset from UTC
+        offset = int(tail.group(4))*3600 + int(tail.group(5))*60
+        secs += -offset if tail.group(3) == '+' else offset
+    if tail.group(1):
+        return secs + float(tail.group(1))
+    return float(secs)
+
+def isoTimeArray(texts):
+    '''
+    vectorised version of isoTime() for an array (or list) of time stamps, parsed in one pass
+    return numpy datetime64[us] (UTC) array, NaT where missing (None) or malformed
+    (use .astype('datetime64[s]').astype(np.int64) for epoch seconds)
+    '''
+    return _isoParse(texts)[0]
+
+def _isoParse(texts):
+    '''
+    parse list of ISO 8601 time stamps (or None) in one pass
+    return (datetime64[us] UTC array, list of time stamp strings with fractional seconds removed or None)
+    '''
+    texts = np.array([(text or '') for text in texts], dtype = 'S')
+    n = len(texts)
+    width = max(texts.dtype.itemsize, 26)
+    chars = texts.astype('S{}'.format(width)).view(np.uint8).reshape(n, width).astype(np.int64)
+    rows = np.arange(n)
+    lengths = (chars != 0).sum(axis = 1)   # strings are null padded
+    digits = chars - ord('0')
+    isDigit = (digits >= 0) & (digits <= 9)
+    value = lambda start, stop: np.dot(digits[:, start:stop], 10**np.arange(stop - start - 1, -1, -1))
+    (year, month, day) = (value(0, 4), value(5, 7), value(8, 10))
+    (hour, minute, second) = (value(11, 13), value(14, 16), value(17, 19))
+    valid = (lengths >= 19) & isDigit[:, [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]].all(axis = 1) & \
+            (chars[:, 4] == ord('-')) & (chars[:, 7] == ord('-')) & ((chars[:, 10] == ord('T')) | (chars[:, 10] == ord(' '))) & \
+            (chars[:, 13] == ord(':')) & (chars[:, 16] == ord(':')) & (hour < 24) & (minute < 60) & (second < 60)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    monthOK = (month >= 1) & (month <= 12)
+    monthDays = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[np.where(monthOK, month - 1, 0)] + (leap & (month == 2))
+    valid &= monthOK & (day >= 1) & (day <= monthDays)
+
+    # time zone designator at end of string (Z, +hh:mm or -hh:mm), else UTC assumed
+    last = chars[rows, np.maximum(lengths - 1, 0)]
+    tzPos = np.maximum(lengths - 6, 0)
+    tzSign = chars[rows, tzPos]
+    hasOffset = (lengths >= 25) & ((tzSign == ord('+')) | (tzSign == ord('-'))) & (chars[rows, np.minimum(tzPos + 3, width - 1)] == ord(':'))
+    offsetDigits = digits[rows[:, None], np.minimum(tzPos[:, None] + np.array([1, 2, 4, 5]), width - 1)]
+    valid &= ~hasOffset | ((offsetDigits >= 0) & (offsetDigits <= 9)).all(axis = 1)
+    offset = np.where(hasOffset, np.dot(offsetDigits, [36000, 3600, 600, 60]), 0) * np.where(tzSign == ord('-'), -1, 1)
+    tzStart = np.where(last == ord('Z'), lengths - 1, np.where(hasOffset, tzPos, lengths))
+
+    # fractional seconds, to microseconds
+    fracEnd = np.where((tzStart > 20) & (chars[:, 19] == ord('.')), tzStart, 19)
+    positions = np.arange(width)
+    inFrac = (positions >= 20) & (positions < fracEnd[:, None])
+    valid &= (tzStart == 19) | ((fracEnd > 19) & (isDigit | ~inFrac).all(axis = 1))
+    micro = np.dot(np.where(inFrac[:, 20:26], digits[:, 20:26], 0), 10**np.arange(5, -1, -1))
+
+    # days since epoch from civil date (H Hinnant's algorithm)
+    y = year - (month <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era*400
+    doy = (153*(month + np.where(month > 2, -3, 9)) + 2)//5 + day - 1
+    days = era*146097 + yoe*365 + yoe//4 - yoe//100 + doy - 719468
+    utc = (days*86400 + hour*3600 + minute*60 + second - offset)*1000000 + micro
+    utc = np.where(valid, utc, np.iinfo(np.int64).min).view('datetime64[us]')    # min is NaT
+
+    # time stamp strings without fractional seconds
+    source = np.where(positions < 19, positions, positions - 19 + fracEnd[:, None])
+    stripped = np.where(positions < (lengths - fracEnd + 19)[:, None], chars[rows[:, None], np.minimum(source, width - 1)], 0)
+    stripped = stripped.astype(np.uint8).view('S{}'.format(width)).ravel().tolist()
+    return (utc, [(ts if ok else None) for (ts, ok) in zip(stripped, valid.tolist())])
+
+def _heightChanges(elevs, tolerV):
+    '''
+    return (gain, loss, ignored count) for list of elevations, where changes within tolerV
+    of the last counted elevation are ignored (a stateful recurrence, so a tight loop)
+    '''
+    up = dn = 0.0
+    ignored = 0
+    prevElev = elevs[0]
+    for elev in elevs:
+        deltaV = elev - prevElev
+        if deltaV > tolerV:
+            up += deltaV
+            prevElev = elev
+        elif deltaV < - tolerV:
+            dn -= deltaV
+            prevElev = elev
+        elif deltaV != 0:
+            ignored += 1
+    return (up, dn, ignored)
+
+# batch processing functions
+# (on Windows, call these from within an if __name__ == '__main__': block)
+
+def batchProcess(inputs, outputDir = None, processes = None, bsv = True, xml = True, report = None, **options):
+    '''
+    process many gpx files in a pool of processes, a failure only affects its own file
+    inputs    -- directory (all *.gpx files), glob pattern or file name, or a list of these
+    outputDir -- directory for each file's BSV (.bsv) & BSV xml (.xml) outputs (default: alongside gpx file)
+    processes -- number of worker processes (default: number of cpus)
+    bsv, xml  -- write BSV, BSV xml outputs
+    report    -- file name for the combined statistics table (BSV, one record per gpx file)
+    options   -- gpx() keyword arguments, eg: delta = True, tolerT = 0
+    return list of (gpx file, stats dictionary or None, error message or None) tuples, in file name order
+    '''
+    if isinstance(inputs, basestring):
+        inputs = [inputs]
+    fileNames = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.gpx')
+        fileNames.extend(sorted(glob.glob(pattern)))
+    if outputDir is not None and not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+    tasks = [(fileName, outputDir, bsv, xml, options) for fileName in fileNames]
+    if not tasks:
+        statusErrMsg('warn', 'crhGPX.batchProcess()', 'no gpx files found: {}'.format(inputs))
+        results = []
+    else:
+        pool = multiprocessing.Pool(processes, _initBatchWorker, (crhMap.osgbTransformer, gpx.quiet, gpx.verbose))
+        try:
+            results = pool.map(_batchWorker, tasks, chunksize = 1)
+        finally:
+            pool.close()
+            pool.join()
+    if report is not None:
+        with open(report, 'w') as reportFile:
+            for line in batchTable(results):
+                reportFile.write(line + '\n')
+    return results
+
+def batchTable(results):
+    '''
+    return list of BSV records (header first) tabulating batchProcess() results, one per gpx file
+    '''
+    keys = sorted(set([key for (fileName, stats, error) in results if stats for key in stats]))
+    lines = ['|'.join(['file', 'error'] + keys)]
+    for (fileName, stats, error) in results:
+        stats = stats or {}
+        lines.append('|'.join([fileName, error or ''] + [('' if stats.get(key) is None else str(stats[key])) for key in keys]))
+    return lines
+
+def _initBatchWorker(transformer, quiet, verbose):
+    '''
+    worker process initialisation, same transformation engine & message settings, exceptions not fatal
+    '''
+    global fatalException
+    crhMap.osgbTransformer = transformer
+    crhMap.fatalException = fatalException = False
+    gpx.quiet = quiet
+    gpx.verbose = verbose
+
+def _batchWorker(task):
+    '''
+    process one gpx file, write its outputs & return (gpx file, stats, error) tuple
+    '''
+    (fileName, outputDir, bsv, xml, options) = task
+    outputF = os.path.splitext(fileName)[0]
+    if outputDir is not None:
+        outputF = os.path.join(outputDir, os.path.basename(outputF))
+    try:
+        gpxData = gpx(fileName, **options)
+        if not gpxData.validData():
+            return (fileName, None, 'no valid way-points')
+        outputs = []    # written to temporary files, renamed once all written
+        if bsv:
+            with open(outputF + '.bsv.tmp', 'w') as outFile:
+                gpxData.genBSV(outFile = outFile)
+            outputs.append(outputF + '.bsv')
+        if xml:
+            with open(outputF + '.xml.tmp', 'w') as outFile:
+                gpxData.genXML(outFile = outFile)
+            outputs.append(outputF + '.xml')
+        for outputName in outputs:
+            os.rename(outputName + '.tmp', outputName)
+        return (fileName, gpxData.getStats(), None)
+    except (Exception, SystemExit) as e:  # isolate failure to this file
+        for extension in ('.bsv.tmp', '.xml.tmp'):
+            if os.path.exists(outputF + extension):
+                os.remove(outputF + extension)
+        statusErrMsg('err', 'crhGPX.batchProcess()', '{}: {}'.format(fileName, e))
+        return (fileName, None, '{}: {}'.format(type(e).__name__, e))
+
+def _discardElement(elem):
+    '''
+    clear a used (iterparse) element & remove its earlier (used) siblings, so memory use stays bounded
+    '''
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+def _wayPtTuples(track):
+    '''
+    return list of (lat, lon, elev, ts) tuples (None if missing) from _track way-point store (or part)
+    '''
+    return zip(track['lat'].tolist(), track['lon'].tolist(), _noneList(track['elev']), [ts or None for ts in track['ts'].tolist()])
+
+def _deltaTuples(track):
+    '''
+    return list of (deltaL, deltaV, deltaS) tuples (None if missing, rounded) from _track way-point store (or part)
+    '''
+    return zip([(None if deltaL is None else round(deltaL, 1)) for deltaL in _noneList(track['deltaL'])],
+               [(None if deltaV is None else round(deltaV, 1)) for deltaV in _noneList(track['deltaV'])],
+               [(None if deltaS is None else int(deltaS)) for deltaS in _noneList(track['deltaS'])])
+
+def _xmlFields(wayPt):
+    '''
+    return (lat, lon, elev, ts) BSV record field strings for a way-point, as _getWayPtBSV()
+    '''
+    (lat, lon, elev, ts) = wayPt
+    return ('{:+010.5f}'.format(lat), '{:+010.5f}'.format(lon), '' if elev is None else '{:+07.1f}'.format(elev), ts or '')
+
+def _jsonText(text):
+    '''
+    return json (unicode) text as str if plain ASCII (as lxml element text), None stays None
+    '''
+    try:
+        return None if text is None else str(text)
+    except UnicodeEncodeError:
+        return text
+
+def _noneList(column):
+    '''
+    return list of float array column values, None where NaN (missing)
+    '''
+    return [(None if value != value else value) for value in column.tolist()]
+
 ## initialise
 
 ## testing code
 # (testing handled by crhGPX-test.py)
 
 if __name__ == '__main__':
-    text = '2015-06-08T09:56:51.9531659+01:00'
-    ts = text[:19]  # remove end of string beyond seconds digits
-    ts = ts.replace('T', ' ')
-    ts = datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
-    secs = int(time.mktime(ts.timetuple()))
-    print text
-    print ts
-    print secs
+    if len(sys.argv) == 1:
+        text = '2015-06-08T09:56:51.9531659+01:00'
+        ts = text[:19]  # remove end of string beyond seconds digits
+        ts = ts.replace('T', ' ')
+        ts = datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
+        secs = int(time.mktime(ts.timetuple()))
+        print text
+        print ts
+        print secs
+        print 'use python -m crhGPX batch -h for batch processing'
+        exit(0)
+    # batch processing command line tool
+    parser = argparse.ArgumentParser(prog = 'python -m crhGPX', description = 'GPX (xml) data utilities (tier 4)')
+    commands = parser.add_subparsers(dest = 'command')
+    batch = commands.add_parser('batch', help = 'process gpx files in parallel',
+                                description = 'write BSV & BSV xml outputs for each gpx file & a combined statistics table')
+    batch.add_argument('inputs', nargs = '+', help = 'gpx directories, glob patterns or files')
+    batch.add_argument('-o', '--outdir', help = 'output directory (default: alongside each gpx file)')
+    batch.add_argument('-r', '--report', default = 'crhGPX-batch.bsv', help = 'statistics table filename (default crhGPX-batch.bsv)')
+    batch.add_argument('-j', '--processes', type = int, default = 0, help = 'worker processes (default 0, for number of cpus)')
+    batch.add_argument('-d', '--delta', action = 'store_true', help = 'include deltas in BSV outputs')
+    batch.add_argument('-s', '--simplify', type = float, default = 0, help = 'simplification tolerance (m) for outputs (default 0, disabled)')
+    batch.add_argument('-c', '--cache', action = 'store_true', help = 'use (& create) way-point cache files (<gpx file>.npz)')
+    batch.add_argument('-q', '--quiet', action = 'store_true', help = 'suppress informational messages')
+    args = parser.parse_args()
+    gpx.quiet = args.quiet
+    startTime = time.time()
+    results = batchProcess(args.inputs, outputDir = args.outdir, processes = args.processes or None, report = args.report,
+                           delta = args.delta, simplifyL = args.simplify, cache = args.cache)
+    failures = len([result for result in results if result[2] is not None])
+    errMsg('{} gpx files processed, {} failed, in {:.2f}sec'.format(len(results), failures, time.time() - startTime))
@@ -2,6 +2,10 @@
 # Copyright (c) 2016 CR Hailey
 # v1.00 crh 07-jan-16 -- initial release
 
+import os
+import tempfile
+from StringIO import StringIO
+import numpy as np
 import crhMap as cm
 
 cm.fatalException  = False # only sensible with bespoke exception handling code
@@ -59,14 +63,46 @@ print '7.6 dms2deg(deg2dms(-1.99))   >> ' + str(cm.dms2deg(cm.deg2dms(-1.99)))
 print '7.7 dms2deg(deg2dms(-1.9999)) >> ' + str(cm.dms2deg(cm.deg2dms(-1.9999)))
 print '7.8 dms2deg(deg2dms(5))       >> ' + str(cm.dms2deg(cm.deg2dms(5)))
 print '7.9 dms2deg(deg2dms(-5))      >> ' + str(cm.dms2deg(cm.deg2dms(-5)))
-print "\n8.0 ngr2osgb('ZZ2755072950') will generate an exception and continue..."
+print "\n8.0 wgs2osgbArray([53.17709, 53.17], [-1.71329, -1.71]) >> " + str(cm.wgs2osgbArray([53.17709, 53.17], [-1.71329, -1.71]))
+print "8.1 osgb2wgsArray([419260, 420230], [364482, 344785]) >> " + str(cm.osgb2wgsArray([419260, 420230], [364482, 344785]))
+print "8.2 osgb2wgsArray(['SK1964', 'SK1926064482']) >> " + str(cm.osgb2wgsArray(['SK1964', 'SK1926064482']))
+print "8.3 ngr2osgbArray(['SK1964', 'SK192644', 'SK1926064482']) >> " + str(cm.ngr2osgbArray(['SK1964', 'SK192644', 'SK1926064482']))
+print "8.4 osgb2ngrArray([419260, 420230], [364482, 344785], 8) >> " + str(cm.osgb2ngrArray([419260, 420230], [364482, 344785], 8))
+print "8.5 Transformer(geoEllipsoid = (A_A, B_A), helmert = (0, 0, 0, 0, 0, 0, 0)).toGrid(52.65757, 1.71792) (OS projection example) >> " + str(cm.Transformer(geoEllipsoid = (cm.A_A, cm.B_A), helmert = (0, 0, 0, 0, 0, 0, 0)).toGrid(52.65757, 1.71792))
+cm.enableCache(maxSize = 1000)
+for i in range(3):
+    cm.wgs2osgb(53.17709, -1.71329)
+print "8.6 enableCache(), 3 x wgs2osgb(53.17709, -1.71329), cacheStats()['wgs2osgb'] >> " + str(cm.cacheStats()['wgs2osgb'])
+cm.disableCache()
+gsFile = os.path.join(tempfile.gettempdir(), 'crhMap-Test-gs.bin')
+cm.writeGridShift(gsFile, 0, 0, 100000, np.tile([90.0, -80.0], (14, 8, 1)))  # synthetic, constant shifts
+cm.setGridShift(gsFile)
+print "8.7 setGridShift(synthetic +90m, -80m shifts), wgs2osgb(53.17709, -1.71329) >> " + str(cm.wgs2osgb(53.17709, -1.71329))
+print "    >> osgb2wgs(*wgs2osgb(53.17709, -1.71329)): " + str(cm.osgb2wgs(*cm.wgs2osgb(53.17709, -1.71329)))
+cm.setGridShift()
+os.remove(gsFile)
+bsvOut = StringIO()
+cm.convertFile(StringIO('name|latitude|longitude\nYoulgrave|53.17709|-1.71329\n'), bsvOut)
+print "8.8 convertFile(name|latitude|longitude BSV) >> " + repr(bsvOut.getvalue())
+print "8.9 bulkWgs2osgb([53.17709, 53.17, 51.5], [-1.71329, -1.71, -0.1], processes = 2, chunkSize = 2) >> " + str(cm.bulkWgs2osgb([53.17709, 53.17, 51.5], [-1.71329, -1.71, -0.1], processes = 2, chunkSize = 2))
+
+spatialIdx = cm.SpatialIndex([419260, 420230, 531979], [364481, 344785, 179606])
+print "8.10 SpatialIndex(3 points).nearest(419000, 364000), kNearest(.., 2), withinRadius(.., 20000) >> " + str((spatialIdx.nearest(419000, 364000), spatialIdx.kNearest(419000, 364000, 2), spatialIdx.withinRadius(419000, 364000, 20000)))
+print "     kNearest(.., 0), SpatialIndex([], []).nearest(419000, 364000) >> " + str((spatialIdx.kNearest(419000, 364000, 0), cm.SpatialIndex([], []).nearest(419000, 364000)))
+print "8.11 vincenty(53.17709, -1.71329, 51.5, -0.1), haversine(..) >> " + str((cm.vincenty(53.17709, -1.71329, 51.5, -0.1), cm.haversine(53.17709, -1.71329, 51.5, -0.1)))
+print "8.12 trackDistances([53.17709, 53.17, 51.5], [-1.71329, -1.71, -0.1]) >> " + str(cm.trackDistances([53.17709, 53.17, 51.5], [-1.71329, -1.71, -0.1]))
+print "8.13 validCoordsArray([419260, -1, 531979], [364481, 5, 179606]), validNGRArray(['SK1964', 'ZZ1964', 'SK19x4']) >> " + str((cm.validCoordsArray([419260, -1, 531979], [364481, 5, 179606]), cm.validNGRArray(['SK1964', 'ZZ1964', 'SK19x4'])))
+print "8.14 deg2dmsArray([53.17709, -1.71329, -0.5]), dms2degArray([53, -1, 0], [10, -42, -30], [37, -48, 0]) >> " + str((cm.deg2dmsArray([53.17709, -1.71329, -0.5]), cm.dms2degArray([53, -1, 0], [10, -42, -30], [37, -48, 0])))
+print "8.15 gridSquareCounts([419260, 419483, 419999, 531979], [364481, 364693, 364000, 179606], 4) >> " + str(cm.gridSquareCounts([419260, 419483, 419999, 531979], [364481, 364693, 364000, 179606], 4))
+print "8.16 simplifyDP([0, 10, 20, 30, 40], [0, 1, 0, 8, 0], 2), simplifyVW(.., 3) >> " + str((cm.simplifyDP([0, 10, 20, 30, 40], [0, 1, 0, 8, 0], 2), cm.simplifyVW([0, 10, 20, 30, 40], [0, 1, 0, 8, 0], 3)))
+print "\n9.0 ngr2osgb('ZZ2755072950') will generate an exception and continue..."
 try:
     cm.ngr2osgb('ZZ2755072950')
 except RuntimeError as re:
     print "RuntimeError trapped: {}".format(re)
 print "    >> validNGR('ZZ2755072950'): {}".format(str(cm.validNGR('ZZ2755072950')))
 cm.fatalException  = True  # the default value
-print "8.1 ngr2osgb('ZZ2755072950') will now generate a fatal exception and exit..."
+print "9.1 ngr2osgb('ZZ2755072950') will now generate a fatal exception and exit..."
 cm.ngr2osgb('ZZ2755072950')
 # the following code will not execute (script terminated!)
 print "    >> validNGR('ZZ2755072950'): {}".format(str(cm.validNGR('ZZ2755072950')))
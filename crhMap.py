@@ -4,6 +4,21 @@
 # v1.02 crh 21-may-15 -- initial release
 # v1.10 crh 29-dec-15 -- wgs2osgb()accepts list/tuple argument & exceptions not always fatal
 # v1.20 crh 07-jan-16 -- more constants added & names rationalised, & some functions added
+# v1.21 crh 17-oct-26 -- wgs2osgbArray() added
+# v1.22 crh 17-oct-26 -- osgb2wgsArray() added
+# v1.23 crh 17-oct-26 -- 100km grid square index & ngr2osgbArray() added
+# v1.24 crh 17-oct-26 -- osgb2ngrArray() added & osgb2ngr() uses integer arithmetic
+# v1.30 crh 17-oct-26 -- Transformer class replaces wgs2osgb() & osgb2wgs() maths (fixes integer division)
+# v1.31 crh 17-oct-26 -- optional LRU conversion caches added
+# v1.32 crh 17-oct-26 -- grid shift (OSTN style) transformation mode added
+# v1.33 crh 17-oct-26 -- convertFile() & python -m crhMap convert command line tool added
+# v1.34 crh 17-oct-26 -- multi-process bulk conversion functions added
+# v1.35 crh 17-oct-26 -- SpatialIndex class added
+# v1.36 crh 17-oct-26 -- haversine(), vincenty() & trackDistances() geodesic distance functions added
+# v1.37 crh 17-oct-26 -- validCoordsArray() & validNGRArray() added, validCoords() fixed
+# v1.38 crh 17-oct-26 -- deg2dmsArray() & dms2degArray() added
+# v1.39 crh 17-oct-26 -- gridSquareCounts() & gridHeatmap() grid square aggregation added
+# v1.40 crh 17-oct-26 -- simplifyDP() & simplifyVW() track simplification added
 
 # derived from BNG.py (John A Stevenson / @volcan01010 http://all-geo.org/volcan01010) &
 # python functions by Hannah Fry (www.hannahfry.co.uk)
@@ -11,6 +26,19 @@
 #!/usr/local/bin/python
 
 import re
+import sys
+import math
+import os
+import time
+import shutil
+import tempfile
+import heapq
+import argparse
+import multiprocessing
+from itertools import islice
+import mmap
+import struct
+from collections import OrderedDict
 from math import floor, sqrt, pi, sin, cos, tan, atan2 as arctan2
 from datetime import date
 import numpy as np
@@ -36,14 +64,15 @@ _regions=[['HL','HM','HN','HO','HP','JL','JM'],
       ['SQ','SR','SS','ST','SU','TQ','TR'],
       ['SV','SW','SX','SY','SZ','TV','TW']]
 
-# constants used by customised wgs2osgb() & osgb2wgs() functions,
-# calculate them once here instead of every time the functions are called :-)
+# constants used as default values by the Transformer class (see also osgbTransformer),
+# the derived coefficients are calculated once when a Transformer object is created :-)
 
 H = 0   # third spherical coord.
 
 # GRS80 ellipsoid (_G)...
 A_G, B_G =6378137.000, 6356752.3141 # GSR80 semi-major and semi-minor axes used for WGS84 (m)
 E2_G = 1- (B_G*B_G)/(A_G*A_G)   # eccentricity of the GRS80 ellipsoid
+R_M = 6371008.8 # mean earth radius (m), used by haversine()
 # Helmut transform (_GA, to go from GRS80 (_G) to Airy 1830 (_A))...
 S = 20.4894*10**-6  # the Scale factor -1
 TX_GA, TY_GA, TZ_GA = -446.448, 125.157, -542.060    # translations along x,y,z axes resp
@@ -66,155 +95,482 @@ LON0 = -2*pi/180    # longtitude of true origin and central meridian (radians)
 N0, E0 = -100000, 400000    # northing & easting of true origin (m)
 N_A = (A_A - B_A)/(A_A + B_A)
 
-def wgs2osgb(lat, lon = None): # derived from WGS84toOSGB36() by Hannah Fry
+_maxIterations = 100    # safety limit for iterative latitude calculations
+
+# binary grid shift file header (see GridShift class)
+_gridShiftHdr = struct.Struct('<8sdddii')
+_gridShiftMagic = 'CRHGS1\0\0'
+
+_caches = None      # conversion caches, keyed on function name, if enabled (see enableCache())
+_cacheDigits = 6    # decimal places lat, lon rounded to for wgs2osgb() cache keys
+
+# NGR output formats & factors, indexed by number of digits
+_ngrFormats = {4:'%s%02i%02i', 6:'%s%03i%03i', 8:'%s%04i%04i', 10:'%s%05i%05i'}
+_ngrFactors = {4:1000, 6:100, 8:10, 10:1}
+
+class GridShift(object):
     '''
-    convert WGS84 latitude, longitude coordinates to OSGB36 numeric coordinates
-    arguments are either pair of floats, or a double list/tuple of floats
-    return double tuple of east, west integers
-    does not check validity of argument values
+    bilinearly interpolated (east, north) shifts from a binary grid shift file, for use
+    by Transformer objects (eg: OSTN15 data converted using writeGridShift())
+    the file is accessed via mmap, so only the parts of the grid actually used are read
+    from disk & the pages are shared by all processes using the same file
+    file format (little endian): _gridShiftHdr header (magic, origin east & north (m),
+    spacing (m), columns, rows) followed by rows x columns x (east, north) shift float32
+    values, rows ordered south to north & columns west to east
     '''
-    # check for single list or tuple, or 2 arguments
-    if lon is None: # assume lat is list or tuple
-        lon = lat[1]    # order matters!
-        lat = lat[0]
+    def __init__(self, fileName):
+        '''
+        initialise object
+        fileName -- binary grid shift file
+        '''
+        self.fileName = fileName
+        self._open()
 
-    # convert to radians
-    # these are on the wrong ellipsoid currently: GRS80. (Denoted by _G)
-    lat_G = lat*pi/180
-    lon_G = lon*pi/180
+    def shifts(self, east, north):
+        '''
+        return double tuple of east, north shifts (m) at grid coordinates east, north,
+        single values (floats) or numpy arrays (float arrays)
+        '''
+        if not isinstance(east, np.ndarray):
+            fx = (east - self.originE)/self.spacing
+            fy = (north - self.originN)/self.spacing
+            if not ((0 <= fx <= self.nCols - 1) and (0 <= fy <= self.nRows - 1)):
+                self._outside((east, north))
+            ix = min(int(fx), self.nCols - 2)
+            iy = min(int(fy), self.nRows - 2)
+            dx, dy = fx - ix, fy - iy
+            ((s00, s01), (s10, s11)) = self._shifts[iy:iy + 2, ix:ix + 2].tolist()
+            return (s00[0]*(1 - dx)*(1 - dy) + s01[0]*dx*(1 - dy) + s10[0]*(1 - dx)*dy + s11[0]*dx*dy,
+                    s00[1]*(1 - dx)*(1 - dy) + s01[1]*dx*(1 - dy) + s10[1]*(1 - dx)*dy + s11[1]*dx*dy)
+        fx = (east - self.originE)/self.spacing
+        fy = (north - self.originN)/self.spacing
+        inside = (fx >= 0) & (fx <= self.nCols - 1) & (fy >= 0) & (fy <= self.nRows - 1)
+        if not inside.all():
+            badIdx = np.flatnonzero(~inside.ravel())[0]
+            self._outside((east.ravel()[badIdx], north.ravel()[badIdx]), (~inside).sum())
+        ix = np.minimum(fx.astype(np.int64), self.nCols - 2)
+        iy = np.minimum(fy.astype(np.int64), self.nRows - 2)
+        dx, dy = fx - ix, fy - iy
+        se = sn = 0
+        for (ox, oy, w) in ((0, 0, (1 - dx)*(1 - dy)), (1, 0, dx*(1 - dy)), (0, 1, (1 - dx)*dy), (1, 1, dx*dy)):
+            s = self._shifts[iy + oy, ix + ox]
+            se = se + w*s[..., 0]
+            sn = sn + w*s[..., 1]
+        return (se, sn)
 
-    nu_G = A_G/sqrt(1-E2_G*sin(lat_G)**2)
+    def close(self):
+        '''
+        release the memory mapped file
+        '''
+        self._shifts = None
+        self._mmap.close()
+        self._file.close()
 
-    # convert to cartesian from spherical polar coordinates
-    x_G = (nu_G + H)*cos(lat_G)*cos(lon_G)
-    y_G = (nu_G + H)*cos(lat_G)*sin(lon_G)
-    z_G = ((1 - E2_G)*nu_G + H)*sin(lat_G)
+    def __getstate__(self):
+        '''
+        pickle the file name only, the file is mapped again when unpickled
+        '''
+        return {'fileName': self.fileName}
 
-    # perform Helmut transform (to go from GRS80 (_G) to Airy 1830 (_A))
-    x_A = TX_GA + (1+S)*x_G + (-RZ_GA)*y_G + (RY_GA)*z_G
-    y_A = TY_GA + (RZ_GA)*x_G+ (1 + S)*y_G + (-RX_GA)*z_G
-    z_A = TZ_GA + (-RY_GA)*x_G + (RX_GA)*y_G +(1 + S)*z_G
+    def __setstate__(self, state):
+        '''
+        unpickle, mapping the file again
+        '''
+        self.fileName = state['fileName']
+        self._open()
 
-    # back to spherical polar coordinates from cartesian
-    # need some of the characteristics of the new ellipsoid
-    p_A = sqrt(x_A**2 + y_A**2)
+    ## private methods
+    def _open(self):
+        '''
+        memory map the grid shift file & check the header
+        '''
+        self._file = open(self.fileName, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        if len(self._mmap) >= _gridShiftHdr.size:
+            (magic, self.originE, self.originN, self.spacing, self.nCols, self.nRows) = _gridShiftHdr.unpack_from(self._mmap)
+        if (len(self._mmap) < _gridShiftHdr.size) or (magic != _gridShiftMagic) or (self.nCols < 2) or (self.nRows < 2) \
+                or (len(self._mmap) != _gridShiftHdr.size + self.nCols*self.nRows*8):
+            self._mmap.close()
+            self._file.close()
+            if fatalException:  # terminate program (default)
+                statusErrMsg('fatal', 'crhMap.GridShift()', 'invalid grid shift file: {}'.format(self.fileName))
+                exit(1)
+            else:   # raise RuntimeError exception
+                statusErrMsg('err', 'crhMap.GridShift()', 'invalid grid shift file: {}'.format(self.fileName))
+                raise RuntimeError('crhMap.GridShift() -- invalid input')
+        self._shifts = np.frombuffer(self._mmap, dtype='<f4', offset=_gridShiftHdr.size).reshape(self.nRows, self.nCols, 2)
 
-    # latitude is obtained by iteration
-    lat = arctan2(z_A,(p_A*(1 - E2_A)))   # initial value
-    latold = 2*pi
-    while abs(lat - latold)>10**-16:
-        lat, latold = latold, lat
-        nu_A = A_A/sqrt(1 - E2_A*sin(latold)**2)
-        lat = arctan2(z_A + E2_A*nu_A*sin(latold), p_A)
+    def _outside(self, coords, count = 1):
+        '''
+        handle coordinates outside grid shift coverage
+        '''
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.GridShift.shifts()', 'coordinates outside grid shift coverage ({}), first: {}'.format(count, coords))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.GridShift.shifts()', 'coordinates outside grid shift coverage ({}), first: {}'.format(count, coords))
+            raise RuntimeError('crhMap.GridShift.shifts() -- invalid input')
+
+def writeGridShift(fileName, originE, originN, spacing, shifts):
+    '''
+    create binary grid shift file for GridShift objects
+    originE, originN -- grid coordinates (m) of first (south west) grid point
+    spacing          -- distance (m) between grid points
+    shifts           -- (rows, columns, 2) array of (east, north) shifts (m), rows ordered south to north
+    '''
+    shifts = np.asarray(shifts, dtype='<f4')
+    with open(fileName, 'wb') as gsFile:
+        gsFile.write(_gridShiftHdr.pack(_gridShiftMagic, originE, originN, spacing, shifts.shape[1], shifts.shape[0]))
+        gsFile.write(np.ascontiguousarray(shifts).tostring())
+
+class Transformer(object):  # derived from WGS84toOSGB36() & OSGB36toWGS84() by Hannah Fry
+    '''
+    convert between geographic lat, lon coordinates on one ellipsoid & transverse Mercator
+    grid east, north coordinates on another, using a Helmert transform between the two,
+    or (if a GridShift object is supplied) by projecting on the geo ellipsoid & applying
+    the interpolated grid shifts instead (OSTN style, sub-metre accuracy)
+    all ellipsoid, Helmert & projection coefficients are calculated once, when created
+    default values give WGS84 (GRS80 ellipsoid) <-> OSGB36 (Airy 1830 ellipsoid) UK National Grid
+    '''
+    def __init__(self, geoEllipsoid = (A_G, B_G), gridEllipsoid = (A_A, B_A),
+                 helmert = (TX_GA, TY_GA, TZ_GA, RXS_GA, RYS_GA, RZS_GA, S),
+                 projection = (F0, LAT0, LON0, E0, N0), gridShift = None):
+        '''
+        initialise object
+        geoEllipsoid  -- (semi-major, semi-minor) axes (m) of lat, lon ellipsoid
+        gridEllipsoid -- (semi-major, semi-minor) axes (m) of grid ellipsoid
+        helmert       -- (tx, ty, tz (m), rx, ry, rz (seconds), scale factor - 1) transform
+                         from geo to grid ellipsoid, the reverse transform negates the translations
+                         & rotations only, reusing the same scale factor (as the original
+                         OSGB36toWGS84() code), so is not the exact inverse
+        projection    -- (scale factor on central meridian, latitude & longitude of
+                         true origin (radians), easting & northing of true origin (m))
+        gridShift     -- GridShift object, replaces gridEllipsoid & helmert if supplied
+        '''
+        self.geoEllipsoid = tuple(geoEllipsoid)
+        self.gridEllipsoid = tuple(gridEllipsoid)
+        self.helmert = tuple(helmert)
+        self.projection = tuple(projection)
+        self.gridShift = gridShift
 
-    # longitude and height are then pretty easy
-    lon = arctan2(y_A,x_A)
-    h = p_A/cos(lat) - nu_A
+        # ellipsoids
+        (self._aGeo, bGeo) = self.geoEllipsoid
+        self._e2Geo = 1 - (bGeo*bGeo)/(self._aGeo*self._aGeo)
+        (self._aGrid, bGrid) = self.gridEllipsoid
+        self._e2Grid = 1 - (bGrid*bGrid)/(self._aGrid*self._aGrid)
 
-    # east, north are the UK National Grid coordinates - eastings and northings
-    # meridional radius of curvature
-    rho = A_A*F0*(1 - E2_A)*(1 - E2_A*sin(lat)**2)**(-1.5)
-    eta2 = nu_A*F0/rho-1
+        # forward (geo to grid) & reverse (grid to geo) Helmert transforms, rotations in radians
+        # (reverse keeps 1 + s, as the original code, so results are unchanged)
+        (tx, ty, tz, rxs, rys, rzs, s) = self.helmert
+        (rx, ry, rz) = (rxs*pi/(180*3600.), rys*pi/(180*3600.), rzs*pi/(180*3600.))
+        self._helmertFwd = (tx, ty, tz, rx, ry, rz, 1 + s)
+        self._helmertRev = (-tx, -ty, -tz, -rx, -ry, -rz, 1 + s)
 
-    m1 = (1 + N_A + (5/4)*N_A**2 + (5/4)*N_A**3) * (lat-LAT0)
-    m2 = (3*N_A + 3*N_A**2 + (21/8)*N_A**3) * sin(lat - LAT0) * cos(lat + LAT0)
-    m3 = ((15/8)*N_A**2 + (15/8)*N_A**3) * sin(2*(lat - LAT0)) * cos(2*(lat + LAT0))
-    m4 = (35/24)*N_A**3 * sin(3*(lat - LAT0)) * cos(3*(lat + LAT0))
+        # projection & meridional arc series coefficients for both ellipsoids
+        (self._f0, self._lat0, self._lon0, self._e0, self._n0) = self.projection
+        self._projGrid = self._projCoefficients(self._aGrid, bGrid)
+        self._projGeo = self._projCoefficients(self._aGeo, bGeo)
 
-    # meridional arc
-    m = B_A * F0 * (m1 - m2 + m3 - m4)
+    def toGrid(self, lat, lon):
+        '''
+        convert lat, lon (degrees) floats to grid coordinates
+        return double tuple of east, north integers (rounded down to nearest metre)
+        '''
+        (east, north) = self._geo2grid(lat*pi/180, lon*pi/180, math)
+        return (int(east), int(north))
+
+    def toGridArray(self, lats, lons):
+        '''
+        convert arrays (or lists/tuples, or single values) of lat, lon (degrees) to grid coordinates
+        return double tuple of east, north integer numpy arrays (rounded down to nearest metre)
+        '''
+        lat = np.array(lats, dtype=np.float64, ndmin=1)
+        lon = np.array(lons, dtype=np.float64, ndmin=1)
+        self._checkShapes('toGridArray', lat, lon)
+        (east, north) = self._geo2grid(lat*pi/180, lon*pi/180, np)
+        return (east.astype(np.int64), north.astype(np.int64))
+
+    def fromGrid(self, east, north):
+        '''
+        convert east, north grid coordinates to lat, lon
+        return double tuple of lat, lon (degrees) floats to precision of 5dp
+        '''
+        (lat, lon) = self._grid2geo(float(east), float(north), math)
+        return (round(lat*180/pi, 5), round(lon*180/pi, 5))
+
+    def fromGridArray(self, east, north):
+        '''
+        convert arrays (or lists/tuples, or single values) of east, north grid coordinates to lat, lon
+        return double tuple of lat, lon (degrees) float numpy arrays to precision of 5dp
+        '''
+        east = np.array(east, dtype=np.float64, ndmin=1)
+        north = np.array(north, dtype=np.float64, ndmin=1)
+        self._checkShapes('fromGridArray', east, north)
+        (lat, lon) = self._grid2geo(east, north, np)
+        return (np.round(lat*180/pi, 5), np.round(lon*180/pi, 5))
+
+    ## private methods, work with single values or numpy arrays as determined by
+    ## the fns argument (math or numpy module, both provide sin, cos, tan & sqrt)
+    def _checkShapes(self, method, arr1, arr2):
+        '''
+        check array arguments have the same shape
+        '''
+        if arr1.shape != arr2.shape:
+            if fatalException:  # terminate program (default)
+                statusErrMsg('fatal', 'crhMap.Transformer.{}()'.format(method), 'mismatched array shapes: {}, {}'.format(arr1.shape, arr2.shape))
+                exit(1)
+            else:   # raise RuntimeError exception
+                statusErrMsg('err', 'crhMap.Transformer.{}()'.format(method), 'mismatched array shapes: {}, {}'.format(arr1.shape, arr2.shape))
+                raise RuntimeError('crhMap.Transformer.{}() -- invalid input'.format(method))
 
-    i = m + N0
-    ii = nu_A*F0*sin(lat)*cos(lat)/2
-    iii = nu_A*F0*sin(lat)*cos(lat)**3*(5- tan(lat)**2 + 9*eta2)/24
-    iiia = nu_A*F0*sin(lat)*cos(lat)**5*(61- 58*tan(lat)**2 + tan(lat)**4)/720
-    iv = nu_A*F0*cos(lat)
-    v = nu_A*F0*cos(lat)**3*(nu_A/rho - tan(lat)**2)/6
-    vi = nu_A*F0*cos(lat)**5*(5 - 18* tan(lat)**2 + tan(lat)**4 + 14*eta2 - 58*eta2*tan(lat)**2)/120
+    def _projCoefficients(self, a, b):
+        '''
+        return (a*F0, b*F0, eccentricity, meridional arc series coefficients...) tuple
+        for ellipsoid with semi-major, semi-minor axes a, b
+        '''
+        n = (a - b)/(a + b)
+        return (a*self._f0, b*self._f0, 1 - (b*b)/(a*a),
+                1 + n + (5./4)*n**2 + (5./4)*n**3,
+                3*n + 3*n**2 + (21./8)*n**3,
+                (15./8)*n**2 + (15./8)*n**3,
+                (35./24)*n**3)
 
-    north = i + ii*(lon - LON0)**2 + iii*(lon - LON0)**4 + iiia*(lon - LON0)**6
-    east = E0 + iv*(lon - LON0) + v*(lon - LON0)**3 + vi*(lon - LON0)**5 
+    def _geo2grid(self, lat, lon, fns):
+        '''
+        lat, lon (radians) on geo ellipsoid to east, north (m) on grid ellipsoid
+        '''
+        if self.gridShift is not None:  # project on geo ellipsoid & apply grid shifts
+            (east, north) = self._project(lat, lon, self._projGeo, fns)
+            (se, sn) = self.gridShift.shifts(east, north)
+            return (east + se, north + sn)
+        (x, y, z) = self._geo2cartesian(lat, lon, self._aGeo, self._e2Geo, fns)
+        (x, y, z) = self._helmertTransform(x, y, z, self._helmertFwd)
+        (lat, lon) = self._cartesian2geo(x, y, z, self._aGrid, self._e2Grid, fns)
+        return self._project(lat, lon, self._projGrid, fns)
 
-    # round down to nearest metre and return as integer value double tuple
-    return (int(east), int(north))
+    def _grid2geo(self, east, north, fns):
+        '''
+        east, north (m) on grid ellipsoid to lat, lon (radians) on geo ellipsoid
+        '''
+        if self.gridShift is not None:  # remove grid shifts & unproject on geo ellipsoid
+            (east, north) = self._removeShifts(east, north)
+            return self._unproject(east, north, self._projGeo, fns)
+        (lat, lon) = self._unproject(east, north, self._projGrid, fns)
+        (x, y, z) = self._geo2cartesian(lat, lon, self._aGrid, self._e2Grid, fns)
+        (x, y, z) = self._helmertTransform(x, y, z, self._helmertRev)
+        return self._cartesian2geo(x, y, z, self._aGeo, self._e2Geo, fns)
 
-def osgb2wgs(east, north = None):   # derived from OSGB36toWGS84() by Hannah Fry
+    def _removeShifts(self, east, north):
+        '''
+        return east, north (m) before grid shifts applied, obtained by iteration
+        as the shifts are indexed by the unshifted coordinates
+        '''
+        (se, sn) = self.gridShift.shifts(east, north)
+        (e, n) = (east - se, north - sn)
+        for i in range(_maxIterations):
+            (se, sn) = self.gridShift.shifts(e, n)
+            (eNew, nNew) = (east - se, north - sn)
+            converged = np.all(np.abs(eNew - e) + np.abs(nNew - n) < 0.0001)
+            (e, n) = (eNew, nNew)
+            if converged:
+                break
+        return (e, n)
+
+    def _project(self, lat, lon, proj, fns):
+        '''
+        lat, lon (radians) to east, north (m) transverse Mercator grid coordinates,
+        proj -- ellipsoid projection coefficients (see _projCoefficients())
+        '''
+        (aF0, bF0, e2) = proj[:3]
+        sinLat, cosLat, tanLat2 = fns.sin(lat), fns.cos(lat), fns.tan(lat)**2
+        tanLat4 = tanLat2*tanLat2
+        nu = aF0/fns.sqrt(1 - e2*sinLat**2)  # transverse radius of curvature
+        rho = aF0*(1 - e2)*(1 - e2*sinLat**2)**(-1.5) # meridional radius
+        eta2 = nu/rho - 1
+
+        i = self._meridionalArc(lat, proj, fns) + self._n0
+        ii = nu*sinLat*cosLat/2
+        iii = nu*sinLat*cosLat**3*(5 - tanLat2 + 9*eta2)/24
+        iiia = nu*sinLat*cosLat**5*(61 - 58*tanLat2 + tanLat4)/720
+        iv = nu*cosLat
+        v = nu*cosLat**3*(nu/rho - tanLat2)/6
+        vi = nu*cosLat**5*(5 - 18*tanLat2 + tanLat4 + 14*eta2 - 58*eta2*tanLat2)/120
+
+        dLon = lon - self._lon0
+        dLon2 = dLon*dLon
+        north = i + dLon2*(ii + dLon2*(iii + dLon2*iiia))
+        east = self._e0 + dLon*(iv + dLon2*(v + dLon2*vi))
+        return (east, north)
+
+    def _unproject(self, east, north, proj, fns):
+        '''
+        east, north (m) transverse Mercator grid coordinates to lat, lon (radians),
+        proj -- ellipsoid projection coefficients (see _projCoefficients())
+        '''
+        (aF0, bF0, e2) = proj[:3]
+        lat = self._footLatitude(north, proj, fns)
+
+        sinLat, cosLat, tanLat = fns.sin(lat), fns.cos(lat), fns.tan(lat)
+        tanLat2 = tanLat*tanLat
+        tanLat4 = tanLat2*tanLat2
+        nu = aF0/fns.sqrt(1 - e2*sinLat**2)  # transverse radius of curvature
+        rho = aF0*(1 - e2)*(1 - e2*sinLat**2)**(-1.5) # meridional radius
+        eta2 = nu/rho - 1
+
+        secLat = 1./cosLat
+        vii = tanLat/(2*rho*nu)
+        viii = tanLat/(24*rho*nu**3)*(5 + 3*tanLat2 + eta2 - 9*tanLat2*eta2)
+        ix = tanLat/(720*rho*nu**5)*(61 + 90*tanLat2 + 45*tanLat4)
+        x = secLat/nu
+        xi = secLat/(6*nu**3)*(nu/rho + 2*tanLat2)
+        xii = secLat/(120*nu**5)*(5 + 28*tanLat2 + 24*tanLat4)
+        xiia = secLat/(5040*nu**7)*(61 + 662*tanLat2 + 1320*tanLat4 + 720*tanLat4*tanLat2)
+
+        dE = east - self._e0
+        dE2 = dE*dE
+        lat = lat - dE2*(vii - dE2*(viii - dE2*ix))
+        lon = self._lon0 + dE*(x - dE2*(xi - dE2*(xii - dE2*xiia)))
+        return (lat, lon)
+
+    def _meridionalArc(self, lat, proj, fns):
+        '''
+        meridional arc (m) from latitude of true origin to lat (radians)
+        '''
+        (bF0, mc1, mc2, mc3, mc4) = proj[1:2] + proj[3:]
+        dLat, sLat = lat - self._lat0, lat + self._lat0
+        return bF0*(mc1*dLat - mc2*fns.sin(dLat)*fns.cos(sLat)
+                    + mc3*fns.sin(2*dLat)*fns.cos(2*sLat) - mc4*fns.sin(3*dLat)*fns.cos(3*sLat))
+
+    def _footLatitude(self, north, proj, fns):
+        '''
+        latitude (radians) with meridional arc matching north (m), obtained by iteration
+        (arrays use a per-element convergence mask)
+        '''
+        if fns is math:
+            lat, m, i = self._lat0, 0, 0
+            while abs(north - self._n0 - m) >= 0.00001 and i < _maxIterations:  # accurate to 0.01mm
+                lat = (north - self._n0 - m)/proj[0] + lat
+                m = self._meridionalArc(lat, proj, fns)
+                i += 1
+            return lat
+        lat = np.empty(north.shape, dtype=np.float64)
+        lat.fill(self._lat0)
+        m = np.zeros(north.shape, dtype=np.float64)
+        todo = np.abs(north - self._n0 - m) >= 0.00001
+        for i in range(_maxIterations):
+            if not todo.any():
+                break
+            lat[todo] = (north[todo] - self._n0 - m[todo])/proj[0] + lat[todo]
+            m[todo] = self._meridionalArc(lat[todo], proj, fns)
+            todo[todo] = np.abs(north[todo] - self._n0 - m[todo]) >= 0.00001
+        return lat
+
+    def _geo2cartesian(self, lat, lon, a, e2, fns):
+        '''
+        lat, lon (radians) to cartesian x, y, z (m) for ellipsoid with semi-major axis a &
+        eccentricity e2 (height assumed zero)
+        '''
+        sinLat, cosLat = fns.sin(lat), fns.cos(lat)
+        nu = a/fns.sqrt(1 - e2*sinLat*sinLat)
+        return (nu*cosLat*fns.cos(lon), nu*cosLat*fns.sin(lon), (1 - e2)*nu*sinLat)
+
+    def _helmertTransform(self, x, y, z, params):
+        '''
+        apply Helmert transform (tx, ty, tz, rx, ry, rz, scale factor) to cartesian x, y, z
+        '''
+        (tx, ty, tz, rx, ry, rz, s1) = params
+        return (tx + s1*x - rz*y + ry*z,
+                ty + rz*x + s1*y - rx*z,
+                tz - ry*x + rx*y + s1*z)
+
+    def _cartesian2geo(self, x, y, z, a, e2, fns):
+        '''
+        cartesian x, y, z (m) to lat, lon (radians) for ellipsoid with semi-major axis a &
+        eccentricity e2, latitude obtained by iteration (arrays use a per-element convergence mask)
+        '''
+        p = fns.sqrt(x*x + y*y)
+        if fns is math:
+            lat = arctan2(z, p*(1 - e2))    # initial value
+            i = 0
+            while i < _maxIterations:
+                latold = lat
+                sinLat = sin(latold)
+                lat = arctan2(z + e2*a/sqrt(1 - e2*sinLat*sinLat)*sinLat, p)
+                if abs(lat - latold) <= 10**-16:
+                    break
+                i += 1
+            return (lat, arctan2(y, x))
+        lat = np.arctan2(z, p*(1 - e2))    # initial value
+        todo = np.ones(lat.shape, dtype=bool)
+        for i in range(_maxIterations):
+            latold = lat[todo]
+            sinLat = np.sin(latold)
+            lat[todo] = np.arctan2(z[todo] + e2*a/np.sqrt(1 - e2*sinLat*sinLat)*sinLat, p[todo])
+            todo[todo] = np.abs(lat[todo] - latold) > 10**-16
+            if not todo.any():
+                break
+        return (lat, np.arctan2(y, x))
+
+def wgs2osgb(lat, lon = None):
+    '''
+    convert WGS84 latitude, longitude coordinates to OSGB36 numeric coordinates
+    arguments are either pair of floats, or a double list/tuple of floats
+    return double tuple of east, west integers
+    does not check validity of argument values
+    '''
+    # check for single list or tuple, or 2 arguments
+    if lon is None: # assume lat is list or tuple
+        lon = lat[1]    # order matters!
+        lat = lat[0]
+    if _caches is not None: # memoised, keyed on lat, lon rounded to _cacheDigits dp
+        key = (round(lat, _cacheDigits), round(lon, _cacheDigits))
+        coords = _caches['wgs2osgb'].get(key)
+        if coords is None:
+            coords = osgbTransformer.toGrid(key[0], key[1])
+            _caches['wgs2osgb'].put(key, coords)
+        return coords
+    return osgbTransformer.toGrid(lat, lon)
+
+def wgs2osgbArray(lats, lons):  # vectorised version of wgs2osgb()
+    '''
+    convert arrays of WGS84 latitude, longitude coordinates to OSGB36 numeric coordinates
+    arguments are numpy arrays (or lists/tuples, or single values) of floats, same shape
+    return double tuple of east, north integer numpy arrays
+    gives identical results to wgs2osgb(), does not check validity of argument values
+    '''
+    return osgbTransformer.toGridArray(lats, lons)
+
+def osgb2wgs(east, north = None):
     '''
     convert OSGB36 numeric coordinates to WGS lat, lon coordinates
     arguments are either a pair of integers, or a NGR
     return double tuple of lat, lon floats to precision of 5dp
     '''
-    
     # check for single tuple or double argument
     if north is None:   # assume NGR
         (east, north) = ngr2osgb(east)
-    east, north = int(east), int(north)
-
-    # Initialise the iterative variables
-    lat, m = LAT0, 0
-
-    while north - N0 - m >= 0.00001: #Accurate to 0.01mm
-        lat = (north - N0 - m)/(A_A*F0) + lat;
-        m1 = (1 + N_A + (5./4)*N_A**2 + (5./4)*N_A**3) * (lat - LAT0)
-        m2 = (3*N_A + 3*N_A**2 + (21./8)*N_A**3) * sin(lat - LAT0) * cos(lat + LAT0)
-        m3 = ((15./8)*N_A**2 + (15./8)*N_A**3) * sin(2*(lat - LAT0)) * cos(2*(lat + LAT0))
-        m4 = (35./24)*N_A**3 * sin(3*(lat - LAT0)) * cos(3*(lat + LAT0))
-        #meridional arc
-        m = B_A * F0 * (m1 - m2 + m3 - m4)          
-
-    # transverse radius of curvature
-    nu_A = A_A*F0/sqrt(1 - E2_A*sin(lat)**2)
-
-    # meridional radius of curvature
-    rho = A_A*F0*(1 - E2_A)*(1 - E2_A*sin(lat)**2)**(-1.5)
-    eta2 = nu_A/rho-1
-
-    secLat = 1./cos(lat)
-    vii = tan(lat)/(2*rho*nu_A)
-    viii = tan(lat)/(24*rho*nu_A**3)*(5+3*tan(lat)**2+eta2 - 9*tan(lat)**2*eta2)
-    ix = tan(lat)/(720*rho*nu_A**5)*(61 + 90*tan(lat)**2 + 45*tan(lat)**4)
-    x = secLat/nu_A
-    xi = secLat/(6*nu_A**3)*(nu_A/rho+2*tan(lat)**2)
-    xii = secLat/(120*nu_A**5)*(5+28*tan(lat)**2 + 24*tan(lat)**4)
-    xiia = secLat/(5040*nu_A**7)*(61 + 662*tan(lat)**2 + 1320*tan(lat)**4 + 720*tan(lat)**6)
-    dE = east - E0
-
-    # these are on the wrong ellipsoid currently: Airy1830 (denoted by _A)
-    lat_A = lat - vii*dE**2 + viii*dE**4 - ix*dE**6
-    lon_A = LON0 + x*dE - xi*dE**3 + xii*dE**5 - xiia*dE**7
-
-    # convert to the GRS80 ellipsoid (denoted by _G). 
-    # first convert to cartesian from spherical polar coordinates
-    H = 0   # third spherical coord. 
-    x_A = (nu_A/F0 + H)*cos(lat_A)*cos(lon_A)
-    y_A = (nu_A/F0+ H)*cos(lat_A)*sin(lon_A)
-    z_A = ((1 - E2_A)*nu_A/F0 + H)*sin(lat_A)
-
-    # Perform Helmut transform (to go from Airy 1830 to GRS80)
-    x_G = TX_AG + (1 + S)*x_A + (-RZ_AG)*y_A + (RY_AG)*z_A
-    y_G = TY_AG + (RZ_AG)*x_A  + (1 + S)*y_A + (-RX_AG)*z_A
-    z_G = TZ_AG + (-RY_AG)*x_A + (RX_AG)*y_A + (1 + S)*z_A
-
-    # back to spherical polar coordinates from cartesian
-    # need a characteristic of the new ellipsoid    
-    p_G = sqrt(x_G**2 + y_G**2)
-
-    # lat is obtained by an iterative procedure:   
-    lat = arctan2(z_G,(p_G*(1 - E2_G))) #Initial value
-    latold = 2*pi
-    while abs(lat - latold)>10**-16: 
-        lat, latold = latold, lat
-        nu_G = A_G/sqrt(1 - E2_G*sin(latold)**2)
-        lat = arctan2(z_G + E2_G*nu_G*sin(latold), p_G)
-
-    #Lon and height are then pretty easy
-    lon = arctan2(y_G, x_G)
-    H = p_G/cos(lat) - nu_G
-
-    #Convert to degrees & returns floats double tuple
-    lat = lat*180/pi
-    lon = lon*180/pi
-    return (round(lat, 5), round(lon, 5))
+    if _caches is not None: # memoised, keyed on integer coordinates
+        key = (int(east), int(north))
+        coords = _caches['osgb2wgs'].get(key)
+        if coords is None:
+            coords = osgbTransformer.fromGrid(key[0], key[1])
+            _caches['osgb2wgs'].put(key, coords)
+        return coords
+    return osgbTransformer.fromGrid(int(east), int(north))
+
+def osgb2wgsArray(east, north = None):  # vectorised version of osgb2wgs()
+    '''
+    convert arrays of OSGB36 numeric coordinates to WGS lat, lon coordinates
+    arguments are either a pair of integer arrays (or lists/tuples), or an array of NGRs
+    return double tuple of lat, lon float numpy arrays to precision of 5dp
+    gives the same results as osgb2wgs(), does not check validity of argument values
+    '''
+    # check for single array (of NGRs) or double argument
+    if north is None:   # assume NGRs
+        (east, north) = ngr2osgbArray(east)
+    east = np.array(east, ndmin=1).astype(np.int64)
+    north = np.array(north, ndmin=1).astype(np.int64)
+    return osgbTransformer.fromGridArray(east, north)
 
 def osgb2ngr(coords, nDigits=6):  # based on from_osgb36() by John Stevenson
     '''
@@ -232,17 +588,21 @@ def osgb2ngr(coords, nDigits=6):  # based on from_osgb36() by John Stevenson
     >>> osgb2ngr(xy, nDigits=4)
     ['HU4339', 'SJ6456', 'TV3735']
     '''
-    if (type(coords) == list):
-        return [osgb2ngr(c, nDigits=nDigits) for c in coords]
+    if (type(coords) == list):  # convert all coordinates in one pass
+        if not coords:
+            return []
+        (x, y) = zip(*coords)
+        return osgb2ngrArray(x, y, nDigits).tolist()
     elif type(coords)==tuple:   # input is a tuple of numeric coordinates
         x, y = coords
-        x_box=np.floor(x/100000.0)  # Convert offset to index in 'regions'
-        y_box=np.floor(y/100000.0)
-        x_offset=100000*x_box
-        y_offset=100000*y_box
-        try: # Catch coordinates outside the region
-            region=_regions[x_box, y_box]
-        except IndexError:
+        if _caches is not None: # memoised, keyed on coordinates at output precision
+            key = (x // _ngrFactors.get(nDigits, 1), y // _ngrFactors.get(nDigits, 1), nDigits)
+            ngr = _caches['osgb2ngr'].get(key)
+            if ngr is not None:
+                return ngr
+        x_box = int(x // 100000)  # Convert offset to index in 'regions'
+        y_box = int(y // 100000)
+        if not ((0 <= x_box < 7) and (0 <= y_box < 13)): # Catch coordinates outside the region
             if fatalException:  # terminate program (default)
                 statusErrMsg('fatal', 'crhMap.osgb2ngr()', 'invalid coordinates (outside UK region): {}'.format(str(coords)))
                 exit(1)
@@ -250,10 +610,9 @@ def osgb2ngr(coords, nDigits=6):  # based on from_osgb36() by John Stevenson
                 statusErrMsg('err', 'crhMap.osgb2ngr()', 'invalid coordinates (outside UK region): {}'.format(str(coords)))
                 raise RuntimeError('crhMap.osgb2ngr() -- invalid input')
         # Format the output based on nDigits
-        formats={4:'%s%02i%02i', 6:'%s%03i%03i', 8:'%s%04i%04i', 10:'%s%05i%05i'}
-        factors={4:1000.0, 6:100.0, 8:10.0, 10:1.0}
         try:    # catch bad number of figures
-            coords=formats[nDigits] % (region, np.floor((x - x_offset)/factors[nDigits]), np.floor((y - y_offset)/factors[nDigits]))
+            factor = _ngrFactors[nDigits]
+            coords = _ngrFormats[nDigits] % (_regions[x_box, y_box], (x - 100000*x_box)//factor, (y - 100000*y_box)//factor)
         except KeyError:
             if fatalException:  # terminate program (default)
                 statusErrMsg('fatal', 'crhMap.osgb2ngr()', 'invalid input for nDigits: {}'.format(nDigits))
@@ -261,6 +620,8 @@ def osgb2ngr(coords, nDigits=6):  # based on from_osgb36() by John Stevenson
             else:   # raise RuntimeError exception
                 statusErrMsg('err', 'crhMap.osgb2ngr()', 'invalid input for nDigits: {}'.format(nDigits))
                 raise RuntimeError('crhMap.osgb2ngr() -- invalid input')
+        if _caches is not None:
+            _caches['osgb2ngr'].put(key, coords)
         return coords
     else:   # invalid input
         if fatalException:  # terminate program (default)
@@ -270,6 +631,51 @@ def osgb2ngr(coords, nDigits=6):  # based on from_osgb36() by John Stevenson
             statusErrMsg('err', 'crhMap.osgb2ngr()', 'invalid input: {}'.format(coords))
             raise RuntimeError('crhMap.osgb2ngr() -- invalid input')
 
+def osgb2ngrArray(east, north, nDigits=6):
+    '''
+    Reformat arrays (or lists/tuples) of OSGB36 numeric coordinates to British National Grid references
+    in one pass, using integer arithmetic & without formatting individual strings
+    return numpy string array (same shape as east) of 4, 6, 8 or 10 figure NGRs, as specified by nDigits
+
+    >>> osgb2ngrArray([443143, 363723, 537395], [1139158, 356004, 35394], nDigits=4)
+    array(['HU4339', 'SJ6456', 'TV3735'], dtype='|S6')
+    '''
+    east = np.array(east, ndmin=1)
+    north = np.array(north, ndmin=1)
+    if (east.shape != north.shape) or (nDigits not in _ngrFactors):
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.osgb2ngrArray()', 'invalid input: shapes {}, {}, nDigits {}'.format(east.shape, north.shape, nDigits))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.osgb2ngrArray()', 'invalid input: shapes {}, {}, nDigits {}'.format(east.shape, north.shape, nDigits))
+            raise RuntimeError('crhMap.osgb2ngrArray() -- invalid input')
+    shape = east.shape
+    x = np.floor(east.ravel()).astype(np.int64)     # no-op apart from type for integer input
+    y = np.floor(north.ravel()).astype(np.int64)
+    x_box = x // 100000 # Convert offset to index in 'regions'
+    y_box = y // 100000
+    invalid = (x_box < 0) | (x_box >= 7) | (y_box < 0) | (y_box >= 13)
+    if invalid.any():   # Catch coordinates outside the region
+        badIdx = np.flatnonzero(invalid)[0]
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.osgb2ngrArray()', 'invalid coordinates (outside UK region) ({} of {}), first: {}'.format(invalid.sum(), len(x), (east.ravel()[badIdx], north.ravel()[badIdx])))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.osgb2ngrArray()', 'invalid coordinates (outside UK region) ({} of {}), first: {}'.format(invalid.sum(), len(x), (east.ravel()[badIdx], north.ravel()[badIdx])))
+            raise RuntimeError('crhMap.osgb2ngrArray() -- invalid input')
+
+    # build the NGR characters as a byte matrix, one row per NGR, then view as strings
+    nFigs = nDigits//2
+    xOff = (x - 100000*x_box) // _ngrFactors[nDigits]
+    yOff = (y - 100000*y_box) // _ngrFactors[nDigits]
+    chars = np.empty((len(x), 2 + nDigits), dtype=np.uint8)
+    chars[:, 0:2] = _regionChars[x_box, y_box]
+    for i in range(nFigs):
+        power = 10**(nFigs - 1 - i)
+        chars[:, 2 + i] = ord('0') + (xOff // power) % 10
+        chars[:, 2 + nFigs + i] = ord('0') + (yOff // power) % 10
+    return chars.view('S{}'.format(2 + nDigits)).reshape(shape)
+
 def ngr2osgb(ngr, fatal = fatalException): # based on to_osgb36() by John Stevenson
     '''
     Reformat British National Grid references to OSGB36 numeric coordinates,
@@ -288,21 +694,26 @@ def ngr2osgb(ngr, fatal = fatalException): # based on to_osgb36() by John Steven
     >>> y
     (1139200, 356000, 35400)
     '''
-    # check for individual coord, or list, tuple or array of ngr
+    # check for individual coord, or list, tuple or array of ngr (converted in one pass)
     if type(ngr)==list:
-        return [ngr2osgb(c) for c in ngr]
+        (east, north) = ngr2osgbArray(ngr)
+        return zip(east.tolist(), north.tolist())
     elif type(ngr)==tuple:
-        return tuple([ngr2osgb(c) for c in ngr])
+        (east, north) = ngr2osgbArray(ngr)
+        return tuple(zip(east.tolist(), north.tolist()))
     elif type(ngr)==type(np.array('string')):
-        return np.array([ ngr2osgb(str(c))  for c in list(ngr) ])
+        (east, north) = ngr2osgbArray(ngr)
+        return np.column_stack((east, north))
     # input is grid reference...
     elif type(ngr)==str and gridRef.match(ngr):
+        if _caches is not None: # memoised, keyed on grid reference
+            coords = _caches['ngr2osgb'].get(ngr)
+            if coords is not None:
+                return coords
         region=ngr[0:2].upper()
-        x_box, y_box = np.where(_regions == region)
         try: # catch bad region codes
-            x_offset = 100000 * x_box[0] # Convert index in 'regions' to offset
-            y_offset = 100000 * y_box[0]
-        except IndexError:  # terminate program (default)
+            (x_offset, y_offset) = _regionOffsets[region]
+        except KeyError:  # terminate program (default)
             if fatalException:
                 statusErrMsg('fatal', 'crhMap.ngr2osgb()', 'invalid 100km grid square code: {}'.format(ngr))
                 exit(1)
@@ -313,6 +724,8 @@ def ngr2osgb(ngr, fatal = fatalException): # based on to_osgb36() by John Steven
         factor = 10**(5-nDigits)
         x,y = (int(ngr[2:2 + nDigits])*factor + x_offset,
                int(ngr[2 + nDigits:2 + 2*nDigits])*factor + y_offset)
+        if _caches is not None:
+            _caches['ngr2osgb'].put(ngr, (x, y))
         return x, y
     else:
         if fatalException:  # terminate program (default)
@@ -322,6 +735,805 @@ def ngr2osgb(ngr, fatal = fatalException): # based on to_osgb36() by John Steven
             statusErrMsg('err', 'crhMap.ngr2osgb()', 'invalid input: {}'.format(ngr))
             raise RuntimeError('crhMap.ngr2osgb() -- invalid input')
 
+def ngr2osgbArray(ngrs):
+    '''
+    convert an array (or list/tuple) of British National Grid references to OSGB36 numeric coordinates
+    in one pass, NGRs can be any mix of 4, 6, 8 or 10 figures
+    return double tuple of east, north integer numpy arrays (same shape as ngrs)
+
+    >>> ngr2osgbArray(['HU431392', 'SJ6356', 'TV3740035400'])
+    (array([443100, 363000, 537400]), array([1139200,  356000,   35400]))
+    '''
+    (east, north, valid, ngrs) = _parseNGRArray(ngrs)
+    if not valid.all():
+        badNGR = ngrs.ravel()[~valid.ravel()][0]
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.ngr2osgbArray()', 'invalid input ({} of {}), first: {}'.format((~valid).sum(), valid.size, badNGR))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.ngr2osgbArray()', 'invalid input ({} of {}), first: {}'.format((~valid).sum(), valid.size, badNGR))
+            raise RuntimeError('crhMap.ngr2osgbArray() -- invalid input')
+    return (east, north)
+
+def _parseNGRArray(ngrs):
+    '''
+    parse an array (or list/tuple) of NGRs in one pass, without validity checks failing
+    return (east, north, valid, ngrs) tuple of arrays (same shape as ngrs),
+    east, north are 0 where not valid
+    '''
+    ngrs = np.array(ngrs, ndmin=1)
+    shape = ngrs.shape
+    ngrs = ngrs.ravel()
+    if ngrs.dtype.kind not in 'SU':  # not array of strings
+        ngrs = np.array([str(c) for c in ngrs])
+    ngrs = ngrs.astype('S{}'.format(max(12, ngrs.dtype.itemsize)))
+    chars = ngrs.view(np.uint8).reshape(len(ngrs), ngrs.dtype.itemsize).astype(np.int32)
+    lengths = (chars != 0).sum(axis=1)   # strings are null padded
+
+    # 100km grid square from the two region letters, via the lookup table
+    letters = chars[:, :2] | 0x20   # lower case
+    lettersOK = ((letters >= ord('a')) & (letters <= ord('z'))).all(axis=1)
+    regionIdx = _regionLookup[np.where(lettersOK, (letters[:, 0] - ord('a'))*26 + letters[:, 1] - ord('a'), 0)]
+    valid = lettersOK & (regionIdx >= 0)
+
+    east = np.zeros(len(ngrs), dtype=np.int64)
+    north = np.zeros(len(ngrs), dtype=np.int64)
+    digits = chars[:, 2:12] - ord('0')
+    for nDigits in (2, 3, 4, 5):  # digits per coordinate for 4, 6, 8 & 10 figure NGRs
+        sel = valid & (lengths == 2 + 2*nDigits)
+        if not sel.any():
+            continue
+        d = digits[sel, :2*nDigits]
+        digitsOK = ((d >= 0) & (d <= 9)).all(axis=1)
+        weights = 10**np.arange(nDigits - 1, -1, -1) * 10**(5 - nDigits)
+        east[sel] = np.dot(d[:, :nDigits], weights)
+        north[sel] = np.dot(d[:, nDigits:], weights)
+        valid[np.flatnonzero(sel)[~digitsOK]] = False
+    valid &= (lengths >= 6) & (lengths <= 12) & (lengths % 2 == 0)
+
+    # add 100km grid square offsets
+    east += 100000 * (regionIdx // 13)
+    north += 100000 * (regionIdx % 13)
+    east[~valid] = north[~valid] = 0
+    return (east.reshape(shape), north.reshape(shape), valid.reshape(shape), ngrs.reshape(shape))
+
+def setGridShift(fileName = None):
+    '''
+    use a binary grid shift file (see GridShift class) for all WGS84 <-> OSGB36 conversions
+    instead of the Helmert transform (only accurate to a few metres),
+    or revert to the Helmert transform if fileName is None
+    '''
+    global osgbTransformer
+    if fileName is None:
+        osgbTransformer = Transformer()
+    else:
+        osgbTransformer = Transformer(gridShift = GridShift(fileName))
+    if _caches is not None: # cached conversions no longer valid
+        _caches['wgs2osgb'].clear()
+        _caches['osgb2wgs'].clear()
+
+# conversion cache functions
+
+class LRUCache(object):
+    '''
+    bounded cache, least recently used entries are discarded when full
+    keeps hit, miss & eviction counts
+    '''
+    def __init__(self, maxSize = 100000):
+        '''
+        initialise object
+        maxSize -- maximum number of entries
+        '''
+        self.maxSize = maxSize
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()   # oldest (least recently used) first
+
+    def get(self, key):
+        '''
+        return value for key (& mark as most recently used), or None if not present
+        '''
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries[key] = value  # re-insert as most recently used
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        '''
+        add value for key, discarding least recently used entry if full
+        '''
+        if key in self._entries:
+            del self._entries[key]
+        elif len(self._entries) >= self.maxSize:
+            self._entries.popitem(last = False)
+            self.evictions += 1
+        self._entries[key] = value
+
+    def clear(self):
+        '''
+        discard all entries & reset counts
+        '''
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        '''
+        return dictionary of cache size & counts
+        '''
+        lookups = self.hits + self.misses
+        return {'size': len(self._entries), 'maxSize': self.maxSize, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hitRate': (1.0 * self.hits / lookups) if lookups else None}
+
+def enableCache(maxSize = 100000, latLonDigits = 6):
+    '''
+    memoise wgs2osgb(), osgb2wgs(), osgb2ngr() & ngr2osgb() single value conversions,
+    useful for long running jobs that revisit the same points
+    maxSize      -- maximum number of entries cached per function (least recently used discarded)
+    latLonDigits -- decimal places lat, lon arguments of wgs2osgb() are rounded to for caching
+                    (6dp is ~0.1m, well within the 1m output precision)
+    any existing caches (& their counts) are discarded
+    '''
+    global _caches, _cacheDigits
+    _cacheDigits = latLonDigits
+    _caches = dict([(name, LRUCache(maxSize)) for name in ('wgs2osgb', 'osgb2wgs', 'osgb2ngr', 'ngr2osgb')])
+
+def disableCache():
+    '''
+    stop memoising conversions & discard caches
+    '''
+    global _caches
+    _caches = None
+
+def cacheStats():
+    '''
+    return dictionary of cache stats dictionaries, keyed on function name,
+    or None if caching not enabled
+    '''
+    if _caches is None:
+        return None
+    return dict([(name, cache.stats()) for (name, cache) in _caches.items()])
+
+# file conversion functions
+
+def convertFile(inputF, outputF, reverse = False, nDigits = 8, chunkSize = 100000, sep = None):
+    '''
+    stream a BSV (or CSV) file of coordinates with a header line, converting chunkSize
+    records at a time & writing them to outputF as they are converted, with columns added:
+    forward -- latitude, longitude (WGS84) columns >> easting, northing, ngr columns added
+    reverse -- easting, northing (or ngr) columns  >> latitude, longitude columns added
+    inputF, outputF -- file names, or open file objects
+    nDigits         -- ngr precision (4|6|8|10 digits)
+    sep             -- field separator, default ',' for .csv input files, '|' otherwise
+    fields that cannot be converted (missing, invalid or outside UK region) are left empty
+    return (records, seconds) tuple
+    '''
+    startTime = time.time()
+    inFile = open(inputF, 'r') if isinstance(inputF, basestring) else inputF
+    outFile = open(outputF, 'w') if isinstance(outputF, basestring) else outputF
+    if sep is None:
+        sep = ',' if isinstance(inputF, basestring) and inputF.lower().endswith('.csv') else '|'
+    try:
+        (cols, outHeader) = _convertHeader(inFile.readline(), reverse, sep)
+        outFile.write(outHeader)
+        records = _convertLines(inFile, outFile, cols, reverse, nDigits, chunkSize, sep)
+    finally:
+        if inFile is not inputF:
+            inFile.close()
+        if outFile is not outputF:
+            outFile.close()
+    return (records, time.time() - startTime)
+
+def _convertHeader(header, reverse, sep):
+    '''
+    return (column indices, output header line) for input header line
+    '''
+    header = header.rstrip('\r\n')
+    names = header.split(sep)
+    if reverse and ('easting' in names) and ('northing' in names):
+        cols = (names.index('easting'), names.index('northing'))
+    elif reverse and ('ngr' in names):
+        cols = (names.index('ngr'),)
+    elif (not reverse) and ('latitude' in names) and ('longitude' in names):
+        cols = (names.index('latitude'), names.index('longitude'))
+    else:
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.convertFile()', 'required columns not found: {}'.format(header))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.convertFile()', 'required columns not found: {}'.format(header))
+            raise RuntimeError('crhMap.convertFile() -- invalid input')
+    if reverse:
+        return (cols, header + sep + 'latitude' + sep + 'longitude\n')
+    return (cols, header + sep + 'easting' + sep + 'northing' + sep + 'ngr\n')
+
+def _convertLines(lines, outFile, cols, reverse, nDigits, chunkSize, sep):
+    '''
+    convert lines (iterable) chunkSize at a time, writing them to outFile with columns added
+    return number of lines converted
+    '''
+    records = 0
+    lines = iter(lines)
+    while True:
+        chunk = [line.rstrip('\r\n') for line in islice(lines, chunkSize)]
+        if not chunk:
+            break
+        fields = [line.split(sep) for line in chunk]
+        if reverse:
+            extras = _convertChunk2wgs(fields, cols, sep)
+        else:
+            extras = _convertChunk2osgb(fields, cols, nDigits, sep)
+        outFile.writelines(['{}{}{}\n'.format(line, sep, extra) for (line, extra) in zip(chunk, extras)])
+        records += len(chunk)
+    return records
+
+def _convertChunk2osgb(fields, cols, nDigits, sep):
+    '''
+    return list of 'easting|northing|ngr' strings for a chunk of split records
+    '''
+    lat = _floatColumn(fields, cols[0])
+    lon = _floatColumn(fields, cols[1])
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    east = np.zeros(len(fields), dtype=np.int64)
+    north = np.zeros(len(fields), dtype=np.int64)
+    (east[ok], north[ok]) = wgs2osgbArray(lat[ok], lon[ok])
+    inUK = ok & validCoordsArray(east, north)
+    ngr = np.zeros(len(fields), dtype='S{}'.format(2 + nDigits))
+    ngr[inUK] = osgb2ngrArray(east[inUK], north[inUK], nDigits)
+    fmt = '{}' + sep + '{}' + sep + '{}'
+    return [fmt.format(e, n, g) if k else sep + sep for (e, n, g, k) in zip(east.tolist(), north.tolist(), ngr.tolist(), ok.tolist())]
+
+def _convertChunk2wgs(fields, cols, sep):
+    '''
+    return list of 'latitude|longitude' strings for a chunk of split records
+    '''
+    if len(cols) == 1:  # ngr column
+        ngrs = [(f[cols[0]].strip() if len(f) > cols[0] else '') for f in fields]
+        (east, north, ok, ngrs) = _parseNGRArray(ngrs)
+    else:
+        east = _floatColumn(fields, cols[0])
+        north = _floatColumn(fields, cols[1])
+        ok = np.isfinite(east) & np.isfinite(north)
+    lat = np.zeros(len(fields))
+    lon = np.zeros(len(fields))
+    (lat[ok], lon[ok]) = osgb2wgsArray(east[ok], north[ok])
+    fmt = '{:+010.5f}' + sep + '{:+010.5f}'
+    return [fmt.format(la, lo) if k else sep for (la, lo, k) in zip(lat.tolist(), lon.tolist(), ok.tolist())]
+
+def _floatColumn(fields, col):
+    '''
+    return float array of column col values from split records, NaN if missing or invalid
+    '''
+    values = [(f[col] if len(f) > col else '') for f in fields]
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:  # some values missing or invalid
+        column = np.empty(len(values))
+        for (i, value) in enumerate(values):
+            try:
+                column[i] = float(value)
+            except ValueError:
+                column[i] = np.nan
+        return column
+
+# multi-process conversion functions
+# (on Windows, call these from within an if __name__ == '__main__': block)
+
+def bulkWgs2osgb(lats, lons, processes = None, chunkSize = 1000000, outputFiles = None):
+    '''
+    wgs2osgbArray() spread across a pool of processes, for very large arrays
+    arguments as wgs2osgbArray(), plus
+    processes   -- number of worker processes (default: number of cpus)
+    chunkSize   -- points converted by a worker at a time
+    outputFiles -- (east, north) file names for results, returned as numpy.memmap arrays,
+                   otherwise results are returned as ordinary numpy arrays
+                   (empty input gives empty files & ordinary empty arrays)
+    the data is passed to the workers via numpy.memmap files, not pickled
+    '''
+    return _bulkConvert('wgs2osgb', lats, lons, np.int64, processes, chunkSize, outputFiles)
+
+def bulkOsgb2wgs(east, north, processes = None, chunkSize = 1000000, outputFiles = None):
+    '''
+    osgb2wgsArray() (east, north arrays only) spread across a pool of processes, for very large arrays
+    arguments as for bulkWgs2osgb()
+    '''
+    return _bulkConvert('osgb2wgs', east, north, np.float64, processes, chunkSize, outputFiles)
+
+def bulkConvertFile(inputF, outputF, processes = None, reverse = False, nDigits = 8, chunkSize = 100000,
+                    sep = None, blockSize = 64*1024*1024):
+    '''
+    convertFile() spread across a pool of processes, for very large files
+    arguments as convertFile() (file names only), plus
+    processes -- number of worker processes (default: number of cpus)
+    blockSize -- approx bytes of input file converted by a worker at a time
+    each worker reads its own block of the input file & writes a part file,
+    the parts are then joined in order
+    return (records, seconds) tuple
+    '''
+    startTime = time.time()
+    if sep is None:
+        sep = ',' if inputF.lower().endswith('.csv') else '|'
+    fileSize = os.path.getsize(inputF)
+    with open(inputF, 'rb') as inFile:  # binary, as blocks are byte offsets (line ends stripped anyway)
+        (cols, outHeader) = _convertHeader(inFile.readline(), reverse, sep)
+        boundaries = [inFile.tell()]
+        while boundaries[-1] + blockSize < fileSize:   # block boundaries, at line ends
+            inFile.seek(boundaries[-1] + blockSize)
+            inFile.readline()
+            if inFile.tell() >= fileSize:
+                break
+            boundaries.append(inFile.tell())
+    boundaries.append(fileSize)
+    tasks = [(inputF, boundaries[i], boundaries[i + 1], '{}.part{:04}'.format(outputF, i), cols, reverse, nDigits, chunkSize, sep)
+             for i in range(len(boundaries) - 1)]
+    try:
+        records = sum(_runPool(_bulkFileWorker, tasks, processes))
+        with open(outputF, 'w') as outFile:    # text mode, as convertFile() (line ends as platform)
+            outFile.write(outHeader)
+            for task in tasks:
+                with open(task[3], 'r') as partFile:
+                    shutil.copyfileobj(partFile, outFile)
+    finally:
+        for task in tasks:
+            if os.path.exists(task[3]):
+                os.remove(task[3])
+    return (records, time.time() - startTime)
+
+def _bulkConvert(function, arr1, arr2, outDtype, processes, chunkSize, outputFiles):
+    '''
+    convert arr1, arr2 using function in a pool of processes via numpy.memmap files
+    '''
+    arr1 = np.asarray(arr1)
+    arr2 = np.asarray(arr2)
+    if (arr1.shape != arr2.shape) or (arr1.ndim != 1):
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.bulk{}()'.format(function), 'invalid array shapes: {}, {}'.format(arr1.shape, arr2.shape))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.bulk{}()'.format(function), 'invalid array shapes: {}, {}'.format(arr1.shape, arr2.shape))
+            raise RuntimeError('crhMap.bulk{}() -- invalid input'.format(function))
+    if len(arr1) == 0:  # nothing to convert (& an empty numpy.memmap can't be created)
+        for fileName in (outputFiles or ()):
+            open(fileName, 'wb').close()
+        return (np.zeros(0, dtype = outDtype), np.zeros(0, dtype = outDtype))
+    tempDir = tempfile.mkdtemp(prefix = 'crhMap')
+    try:
+        inputs = []
+        for (i, arr) in enumerate((arr1, arr2)):
+            inputs.append((os.path.join(tempDir, 'in{}'.format(i)), arr.dtype.str, arr.shape))
+            arr.tofile(inputs[-1][0])
+        if outputFiles is None:
+            outputs = [(os.path.join(tempDir, 'out{}'.format(i)), np.dtype(outDtype).str, arr1.shape) for i in (0, 1)]
+        else:
+            outputs = [(fileName, np.dtype(outDtype).str, arr1.shape) for fileName in outputFiles]
+        for (fileName, dtype, shape) in outputs:    # create output files
+            np.memmap(fileName, dtype = dtype, mode = 'w+', shape = shape).flush()
+        tasks = [(function, inputs, outputs, start, min(start + chunkSize, len(arr1))) for start in range(0, len(arr1), chunkSize)]
+        _runPool(_bulkArrayWorker, tasks, processes)
+        if outputFiles is None:
+            return tuple([np.fromfile(fileName, dtype = dtype) for (fileName, dtype, shape) in outputs])
+        return tuple([np.memmap(fileName, dtype = dtype, mode = 'r+', shape = shape) for (fileName, dtype, shape) in outputs])
+    finally:
+        shutil.rmtree(tempDir, ignore_errors = True)
+
+def _runPool(worker, tasks, processes):
+    '''
+    run worker on tasks in a pool of processes set up like this one, return list of results in order
+    '''
+    pool = multiprocessing.Pool(processes, _initWorker, (osgbTransformer, fatalException))
+    try:
+        results = pool.map(worker, tasks, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+def _initWorker(transformer, fatal):
+    '''
+    worker process initialisation, use same transformation engine & exception handling
+    '''
+    global osgbTransformer, fatalException
+    osgbTransformer = transformer
+    fatalException = fatal
+
+def _bulkArrayWorker(task):
+    '''
+    convert a slice of the input memmap arrays into the output memmap arrays
+    '''
+    (function, inputs, outputs, start, stop) = task
+    (in1, in2) = [np.memmap(fileName, dtype = dtype, mode = 'r', shape = shape) for (fileName, dtype, shape) in inputs]
+    (out1, out2) = [np.memmap(fileName, dtype = dtype, mode = 'r+', shape = shape) for (fileName, dtype, shape) in outputs]
+    if function == 'wgs2osgb':
+        (out1[start:stop], out2[start:stop]) = wgs2osgbArray(in1[start:stop], in2[start:stop])
+    else:
+        (out1[start:stop], out2[start:stop]) = osgb2wgsArray(in1[start:stop], in2[start:stop])
+    out1.flush()
+    out2.flush()
+    return stop - start
+
+def _bulkFileWorker(task):
+    '''
+    convert the lines in a block of the input file into a part file
+    '''
+    (inputF, start, end, partF, cols, reverse, nDigits, chunkSize, sep) = task
+    with open(inputF, 'rb') as inFile:
+        with open(partF, 'w') as partFile:
+            inFile.seek(start)
+            return _convertLines(_blockLines(inFile, end), partFile, cols, reverse, nDigits, chunkSize, sep)
+
+def _blockLines(inFile, end):
+    '''
+    generate lines from inFile until position end reached
+    '''
+    while inFile.tell() < end:
+        line = inFile.readline()
+        if not line:
+            break
+        yield line
+
+# geodesic distance functions (lat, lon in degrees, work anywhere, not just UK)
+
+def haversine(lat1, lon1, lat2, lon2, radius = R_M):
+    '''
+    return (distances (m), initial bearings (degrees)) from (lat1, lon1) to (lat2, lon2),
+    on a sphere -- arguments can be scalars or arrays
+    '''
+    (lat1, lon1, lat2, lon2) = [np.radians(np.asarray(x, dtype = np.float64)) for x in (lat1, lon1, lat2, lon2)]
+    dLon = lon2 - lon1
+    h = np.sin((lat2 - lat1)/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin(dLon/2)**2
+    distances = 2*radius*np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+    bearings = np.degrees(np.arctan2(np.sin(dLon)*np.cos(lat2),
+                                     np.cos(lat1)*np.sin(lat2) - np.sin(lat1)*np.cos(lat2)*np.cos(dLon))) % 360
+    return (distances, bearings)
+
+def vincenty(lat1, lon1, lat2, lon2, ellipsoid = (A_G, B_G)):
+    '''
+    return (distances (m), initial bearings (degrees)) from (lat1, lon1) to (lat2, lon2),
+    on an ellipsoid (default GRS80/WGS84), Vincenty's inverse formula (~0.5mm) --
+    arguments can be scalars or arrays
+    the few nearly antipodal points that don't converge use haversine() values
+    '''
+    (a, b) = ellipsoid
+    f = (a - b)/a
+    scalar = all([np.ndim(x) == 0 for x in (lat1, lon1, lat2, lon2)])
+    (lat1, lon1, lat2, lon2) = np.broadcast_arrays(*[np.radians(np.array(x, dtype = np.float64, ndmin = 1))
+                                                      for x in (lat1, lon1, lat2, lon2)])
+    L = (lon2 - lon1 + pi) % (2*pi) - pi
+    U1 = np.arctan((1 - f)*np.tan(lat1))
+    U2 = np.arctan((1 - f)*np.tan(lat2))
+    (sinU1, cosU1, sinU2, cosU2) = (np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2))
+    lamda = L.copy()
+    active = np.ones(L.shape, dtype = bool)
+    iterations = 0
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        while active.any() and iterations < _maxIterations:  # only unconverged elements updated
+            (sinLamda, cosLamda) = (np.sin(lamda), np.cos(lamda))
+            sinSigma = np.sqrt((cosU2*sinLamda)**2 + (cosU1*sinU2 - sinU1*cosU2*cosLamda)**2)
+            cosSigma = sinU1*sinU2 + cosU1*cosU2*cosLamda
+            sigma = np.arctan2(sinSigma, cosSigma)
+            sinAlpha = np.where(sinSigma == 0, 0.0, cosU1*cosU2*sinLamda/sinSigma)
+            cos2Alpha = 1 - sinAlpha**2
+            cos2SigmaM = np.where(cos2Alpha == 0, 0.0, cosSigma - 2*sinU1*sinU2/cos2Alpha)    # equatorial line
+            C = f/16*cos2Alpha*(4 + f*(4 - 3*cos2Alpha))
+            lamdaNew = L + (1 - C)*f*sinAlpha*(sigma + C*sinSigma*(cos2SigmaM + C*cosSigma*(-1 + 2*cos2SigmaM**2)))
+            converged = np.abs(lamdaNew - lamda) <= 1e-12
+            lamda = np.where(active, lamdaNew, lamda)
+            active &= ~converged
+            iterations += 1
+        (sinLamda, cosLamda) = (np.sin(lamda), np.cos(lamda))
+        sinSigma = np.sqrt((cosU2*sinLamda)**2 + (cosU1*sinU2 - sinU1*cosU2*cosLamda)**2)
+        cosSigma = sinU1*sinU2 + cosU1*cosU2*cosLamda
+        sigma = np.arctan2(sinSigma, cosSigma)
+        sinAlpha = np.where(sinSigma == 0, 0.0, cosU1*cosU2*sinLamda/sinSigma)
+        cos2Alpha = 1 - sinAlpha**2
+        cos2SigmaM = np.where(cos2Alpha == 0, 0.0, cosSigma - 2*sinU1*sinU2/cos2Alpha)
+    u2 = cos2Alpha*(a*a - b*b)/(b*b)
+    A = 1 + u2/16384*(4096 + u2*(-768 + u2*(320 - 175*u2)))
+    B = u2/1024*(256 + u2*(-128 + u2*(74 - 47*u2)))
+    deltaSigma = B*sinSigma*(cos2SigmaM + B/4*(cosSigma*(-1 + 2*cos2SigmaM**2) -
+                                              B/6*cos2SigmaM*(-3 + 4*sinSigma**2)*(-3 + 4*cos2SigmaM**2)))
+    distances = b*A*(sigma - deltaSigma)
+    bearings = np.degrees(np.arctan2(cosU2*sinLamda, cosU1*sinU2 - sinU1*cosU2*cosLamda)) % 360
+    if active.any():    # not converged, use spherical approximation
+        (d, brg) = haversine(np.degrees(lat1[active]), np.degrees(lon1[active]), np.degrees(lat2[active]),
+                             np.degrees(lon2[active]), (2*a + b)/3)
+        (distances[active], bearings[active]) = (d, brg)
+    if scalar:
+        return (distances[0], bearings[0])
+    return (distances, bearings)
+
+def trackDistances(lats, lons, method = 'vincenty'):
+    '''
+    return (segments, cumulative) distance (m) arrays for a track of lat, lon points,
+    segments[i] is the distance from point i-1 to point i (segments[0] = 0),
+    cumulative[i] is the distance along the track to point i
+    method -- 'vincenty' (ellipsoidal) or 'haversine' (spherical, faster)
+    '''
+    lats = np.array(lats, dtype = np.float64, ndmin = 1)
+    lons = np.array(lons, dtype = np.float64, ndmin = 1)
+    if method not in ('vincenty', 'haversine') or lats.shape != lons.shape or lats.ndim != 1:
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.trackDistances()', 'invalid input: {}, {}, {}'.format(lats.shape, lons.shape, method))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.trackDistances()', 'invalid input: {}, {}, {}'.format(lats.shape, lons.shape, method))
+            raise RuntimeError('crhMap.trackDistances() -- invalid input')
+    segments = np.zeros(lats.shape)
+    if len(lats) > 1:
+        function = vincenty if method == 'vincenty' else haversine
+        segments[1:] = function(lats[:-1], lons[:-1], lats[1:], lons[1:])[0]
+    return (segments, np.cumsum(segments))
+
+# spatial index functions
+
+class SpatialIndex(object):
+    '''
+    uniform grid index of OSGB points (default 1km squares, as used by osgb2ngr()),
+    for nearest, k-nearest & radius queries in easting/northing space
+    queries return indices into the arrays the index was built from, so other data
+    can be kept in parallel arrays (for lat, lon or NGR points use wgs2osgbArray(), ngr2osgbArray())
+    objects can be pickled for reuse
+    '''
+    def __init__(self, east, north, cellSize = 1000):
+        '''
+        initialise object -- build index
+        east, north -- arrays (or lists) of coordinates (m), may be empty (queries then find nothing)
+        cellSize    -- grid square size (m), ideally close to typical query radius
+        '''
+        east = np.array(east, dtype = np.float64, ndmin = 1)
+        north = np.array(north, dtype = np.float64, ndmin = 1)
+        if (east.shape != north.shape) or (east.ndim != 1):
+            if fatalException:  # terminate program (default)
+                statusErrMsg('fatal', 'crhMap.SpatialIndex()', 'invalid array shapes: {}, {}'.format(east.shape, north.shape))
+                exit(1)
+            else:   # raise RuntimeError exception
+                statusErrMsg('err', 'crhMap.SpatialIndex()', 'invalid array shapes: {}, {}'.format(east.shape, north.shape))
+                raise RuntimeError('crhMap.SpatialIndex() -- invalid input')
+        self.cellSize = cellSize
+        cellX = np.floor_divide(east, cellSize).astype(np.int64)
+        cellY = np.floor_divide(north, cellSize).astype(np.int64)
+        if len(east):
+            (self._minX, self._maxX) = (int(cellX.min()), int(cellX.max()))
+            (self._minY, self._maxY) = (int(cellY.min()), int(cellY.max()))
+        else:   # no cells, so every search range is empty
+            (self._minX, self._maxX, self._minY, self._maxY) = (0, -1, 0, -1)
+        self._nY = self._maxY - self._minY + 1
+        keys = (cellX - self._minX)*self._nY + (cellY - self._minY)  # column major, so each column of cells is contiguous
+        self._order = np.argsort(keys, kind = 'mergesort')
+        self._keys = keys[self._order]
+        self._east = east[self._order]
+        self._north = north[self._order]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def nearest(self, east, north):
+        '''
+        return (index, distance) of point nearest (east, north), (None, None) if the index is empty
+        '''
+        (indices, distances) = self.kNearest(east, north, 1)
+        if len(indices) == 0:
+            return (None, None)
+        return (int(indices[0]), float(distances[0]))
+
+    def kNearest(self, east, north, k):
+        '''
+        return (indices, distances) arrays of (up to) k points nearest (east, north), nearest first
+        (empty arrays if k is 0 or the index is empty)
+        '''
+        if k < 0:
+            if fatalException:  # terminate program (default)
+                statusErrMsg('fatal', 'crhMap.SpatialIndex.kNearest()', 'invalid k: {}'.format(k))
+                exit(1)
+            else:   # raise RuntimeError exception
+                statusErrMsg('err', 'crhMap.SpatialIndex.kNearest()', 'invalid k: {}'.format(k))
+                raise RuntimeError('crhMap.SpatialIndex.kNearest() -- invalid input')
+        k = min(k, len(self))
+        if k == 0:
+            return (np.zeros(0, dtype = np.int64), np.zeros(0))
+        (cellX, cellY) = (int(floor(east/self.cellSize)), int(floor(north/self.cellSize)))
+        ring = max(0, self._minX - cellX, cellX - self._maxX, self._minY - cellY, cellY - self._maxY)
+        while True: # widen search until k found, no nearer points can be outside the ring of cells searched
+            (positions, distances) = self._search(east, north, cellX - ring, cellX + ring, cellY - ring, cellY + ring)
+            if len(positions) >= k:
+                nearest = np.argsort(distances, kind = 'mergesort')[:k]
+                if (distances[nearest[-1]] <= ring*self.cellSize) or (len(positions) == len(self)):
+                    return (self._order[positions[nearest]], distances[nearest])
+            ring += 1
+
+    def withinRadius(self, east, north, radius):
+        '''
+        return (indices, distances) arrays of points within radius (m) of (east, north), nearest first
+        '''
+        (positions, distances) = self._search(east, north,
+                                              int(floor((east - radius)/self.cellSize)), int(floor((east + radius)/self.cellSize)),
+                                              int(floor((north - radius)/self.cellSize)), int(floor((north + radius)/self.cellSize)))
+        inside = distances <= radius
+        (positions, distances) = (positions[inside], distances[inside])
+        nearest = np.argsort(distances, kind = 'mergesort')
+        return (self._order[positions[nearest]], distances[nearest])
+
+    def _search(self, east, north, x0, x1, y0, y1):
+        '''
+        return (positions, distances) of points in cells x0..x1, y0..y1 (inclusive)
+        positions index the sorted arrays
+        '''
+        (x0, x1) = (max(x0, self._minX), min(x1, self._maxX))
+        (y0, y1) = (max(y0, self._minY), min(y1, self._maxY))
+        if (x0 > x1) or (y0 > y1):
+            return (np.zeros(0, dtype = np.int64), np.zeros(0))
+        columns = (np.arange(x0, x1 + 1) - self._minX)*self._nY
+        starts = np.searchsorted(self._keys, columns + (y0 - self._minY), 'left')
+        stops = np.searchsorted(self._keys, columns + (y1 - self._minY), 'right')
+        lengths = stops - starts
+        if lengths.sum() == 0:
+            return (np.zeros(0, dtype = np.int64), np.zeros(0))
+        # concatenate ranges starts[i]..stops[i]
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        distances = np.hypot(self._east[positions] - east, self._north[positions] - north)
+        return (positions, distances)
+
+# grid square aggregation functions
+
+def gridSquareCounts(east, north, nDigits = 4):
+    '''
+    count OSGB36 points per NGR grid square, without creating NGR strings
+    nDigits -- square size as for osgb2ngr(), 4 (1km), 6 (100m), 8 (10m) or 10 (1m) figures
+    return (squareEast, squareNorth, counts) tuple of integer numpy arrays, for occupied squares only,
+    squareEast, squareNorth are the square SW corners, ordered by easting then northing
+    (use osgb2ngrArray(squareEast, squareNorth, nDigits) to label them),
+    points outside the UK region are ignored
+    '''
+    (col, row, factor) = _gridSquares(east, north, nDigits, 'gridSquareCounts')
+    if len(col) == 0:
+        empty = np.zeros(0, dtype = np.int64)
+        return (empty, empty.copy(), empty.copy())
+    (col0, row0) = (col.min(), row.min())
+    nRows = row.max() - row0 + 1
+    keys = (col - col0)*nRows + (row - row0)
+    nKeys = (col.max() - col0 + 1)*nRows
+    if nKeys <= max(4*len(keys), 1000000):   # dense enough to count directly
+        counts = np.bincount(keys, minlength = nKeys)
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        (keys, counts) = np.unique(keys, return_counts = True)
+    return ((keys // nRows + col0)*factor, (keys % nRows + row0)*factor, counts.astype(np.int64))
+
+def gridHeatmap(east, north, nDigits = 4, origin = None, shape = None):
+    '''
+    count OSGB36 points per NGR grid square (see gridSquareCounts()) into a 2-D grid
+    origin -- (east, north) SW corner of the grid, moved down to a square corner if not on one
+              (default: SW corner of the points' squares)
+    shape  -- (rows, columns) of the grid (default: just covers the points)
+    return (counts, origin) tuple, origin is the (square aligned) SW corner of the grid,
+    counts[row, column] is the count for the square (origin[0] + column*size, origin[1] + row*size),
+    so row 0 is the southern edge, points outside the grid are ignored
+    '''
+    (col, row, factor) = _gridSquares(east, north, nDigits, 'gridHeatmap')
+    if origin is None:
+        origin = ((int(col.min())*factor, int(row.min())*factor) if len(col) else (0, 0))
+    origin = (int(origin[0]//factor*factor), int(origin[1]//factor*factor))
+    (col, row) = (col - origin[0]//factor, row - origin[1]//factor)
+    if shape is None:
+        shape = ((int(row.max()) + 1, int(col.max()) + 1) if len(col) else (0, 0))
+    inside = (col >= 0) & (col < shape[1]) & (row >= 0) & (row < shape[0])
+    counts = np.bincount(row[inside]*shape[1] + col[inside], minlength = shape[0]*shape[1])
+    return (counts.reshape(shape).astype(np.int64), origin)
+
+def _gridSquares(east, north, nDigits, caller):
+    '''
+    return (column, row, square size) for points within the UK region,
+    column, row are integer square indices from the false origin
+    '''
+    if nDigits not in _ngrFactors:
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.{}()'.format(caller), 'invalid input for nDigits: {}'.format(nDigits))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.{}()'.format(caller), 'invalid input for nDigits: {}'.format(nDigits))
+            raise RuntimeError('crhMap.{}() -- invalid input'.format(caller))
+    east = np.asarray(east).ravel()
+    north = np.asarray(north).ravel()
+    inUK = validCoordsArray(east, north)
+    factor = _ngrFactors[nDigits]
+    return (np.floor_divide(east[inUK], factor).astype(np.int64),
+            np.floor_divide(north[inUK], factor).astype(np.int64), factor)
+
+# track simplification functions (OSGB36 coordinates, or any other planar coordinates in metres)
+
+def simplifyDP(east, north, tolerance):
+    '''
+    Douglas-Peucker line simplification, iterative (not recursive) so any number of points,
+    each pass splits all the outstanding line segments at once
+    tolerance -- max distance (m) of a discarded point from the simplified line
+    return boolean numpy array, True for points retained (first & last always retained)
+    '''
+    (east, north) = _simplifyInput(east, north, tolerance, 'simplifyDP')
+    keep = np.zeros(len(east), dtype = bool)
+    if len(east) == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    (firsts, lasts) = (np.array([0]), np.array([len(east) - 1]))   # line segments still to simplify
+    while len(firsts):
+        counts = lasts - firsts - 1 # points between segment ends
+        (firsts, lasts, counts) = (firsts[counts > 0], lasts[counts > 0], counts[counts > 0])
+        if len(firsts) == 0:
+            break
+        starts = np.cumsum(counts) - counts # of each segment's points in the pass arrays
+        segment = np.repeat(np.arange(len(firsts)), counts)
+        points = np.arange(counts.sum()) - starts[segment] + firsts[segment] + 1
+        (e0, n0) = (east[firsts][segment], north[firsts][segment])
+        dE = east[lasts][segment] - e0
+        dN = north[lasts][segment] - n0
+        (pE, pN) = (east[points] - e0, north[points] - n0)
+        lengthSq = dE*dE + dN*dN
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):    # distance from line segment (a closed loop has no line)
+            t = np.where(lengthSq > 0, np.clip((pE*dE + pN*dN) / lengthSq, 0.0, 1.0), 0.0)
+        (pE, pN) = (pE - t*dE, pN - t*dN)
+        distSq = pE*pE + pN*pN
+        maxDistSq = np.maximum.reduceat(distSq, starts)
+        (segments, firstMax) = np.unique(segment[distSq == maxDistSq[segment]], return_index = True)
+        farthest = points[distSq == maxDistSq[segment]][firstMax]   # first farthest point of each segment
+        split = maxDistSq > tolerance*tolerance
+        keep[farthest[split]] = True
+        (firsts, lasts) = (np.concatenate((firsts[split], farthest[split])), np.concatenate((farthest[split], lasts[split])))
+    return keep
+
+def simplifyVW(east, north, count):
+    '''
+    Visvalingam-Whyatt line simplification, repeatedly discarding the point of least effective area
+    (the triangle it forms with its neighbours) until count points remain
+    return boolean numpy array, True for points retained (first & last always retained)
+    '''
+    (east, north) = _simplifyInput(east, north, count, 'simplifyVW')
+    size = len(east)
+    keep = np.ones(size, dtype = bool)
+    if size <= max(count, 2):
+        return keep
+    prevIdx = range(-1, size - 1)
+    nextIdx = range(1, size + 1)
+    area = lambda a, b, c: abs((east[a] - east[c])*(north[b] - north[a]) - (east[a] - east[b])*(north[c] - north[a])) / 2.0
+    areas = np.zeros(size)
+    areas[1:-1] = np.abs((east[:-2] - east[2:])*(north[1:-1] - north[:-2]) - (east[:-2] - east[1:-1])*(north[2:] - north[:-2])) / 2.0
+    areas = areas.tolist()
+    (east, north) = (east.tolist(), north.tolist())  # faster element access
+    heap = [(areas[idx], idx) for idx in range(1, size - 1)]
+    heapq.heapify(heap)
+    remaining = size
+    while remaining > max(count, 2):
+        (minArea, idx) = heapq.heappop(heap)
+        if not keep[idx] or minArea != areas[idx]:   # already discarded or out of date
+            continue
+        keep[idx] = False
+        remaining -= 1
+        (before, after) = (prevIdx[idx], nextIdx[idx])
+        nextIdx[before] = after
+        prevIdx[after] = before
+        for neighbour in (before, after):   # area never less than that of a point already discarded
+            if 0 < neighbour < size - 1:
+                areas[neighbour] = max(area(prevIdx[neighbour], neighbour, nextIdx[neighbour]), minArea)
+                heapq.heappush(heap, (areas[neighbour], neighbour))
+    return keep
+
+def _simplifyInput(east, north, limit, caller):
+    '''
+    return east, north as float arrays, after checking them & the tolerance or count limit
+    '''
+    east = np.asarray(east, dtype = np.float64).ravel()
+    north = np.asarray(north, dtype = np.float64).ravel()
+    if east.shape != north.shape or limit < 0:
+        if fatalException:  # terminate program (default)
+            statusErrMsg('fatal', 'crhMap.{}()'.format(caller), 'invalid input: shapes {}, {}, limit {}'.format(east.shape, north.shape, limit))
+            exit(1)
+        else:   # raise RuntimeError exception
+            statusErrMsg('err', 'crhMap.{}()'.format(caller), 'invalid input: shapes {}, {}, limit {}'.format(east.shape, north.shape, limit))
+            raise RuntimeError('crhMap.{}() -- invalid input'.format(caller))
+    return (east, north)
+
 # utility functions
 
 def validCoords(east, north = None):
@@ -333,41 +1545,43 @@ def validCoords(east, north = None):
     if north is None:   # east supplied as tuple
         north = east[1]
         east = east[0]
-    x, y = east, north
-    x_box=np.floor(x/100000.0)  # Convert offset to index in 'regions'
-    y_box=np.floor(y/100000.0)
-    x_offset=100000*x_box
-    y_offset=100000*y_box
-    try: # Catch coordinates outside the region
-        region=_regions[x_box, y_box]
-        return True
-    except IndexError:  # expected error
-        return False
-    except Error:   # unexpected error!
+    try: # Convert offset to index in 'regions'
+        x_box = int(floor(east/100000.0))
+        y_box = int(floor(north/100000.0))
+    except (TypeError, ValueError, OverflowError):  # unexpected error!
         statusErrMsg('warn', 'crhMap.validCoords()', 'invalid input: {}, {}'.format(east, north))
         return False
+    return (0 <= x_box < 7) and (0 <= y_box < 13)   # coordinates within the region
+
+def validCoordsArray(east, north):
+    '''
+    vectorised version of validCoords(), for bulk data cleaning
+    return boolean numpy array, True where OSGB36 numeric coords (any numeric arrays) are within UK region
+    '''
+    east = np.asarray(east, dtype = np.float64)
+    north = np.asarray(north, dtype = np.float64)
+    with np.errstate(invalid = 'ignore'):   # NaN compares false
+        return (east >= 0) & (east < 700000) & (north >= 0) & (north < 1300000)
 
 def validNGR(ngr):
     '''
     checks if argument is valid UK NGR
-    return True if valid, False otherwise, but an
-    unexpected exception will also give a warning status message
+    return True if valid, False otherwise, but
+    malformed input will also give a warning status message
     '''
     if type(ngr) == str and gridRef.match(ngr):
-        region=ngr[0:2].upper()
-        x_box, y_box = np.where(_regions == region)
-        try: # catch bad region codes
-            x_offset = 100000 * x_box[0] # Convert index in 'regions' to offset
-            y_offset = 100000 * y_box[0]
-            return True
-        except IndexError:  # expected error
-            return False
-        except Error:   # unexpected error!
-            statusErrMsg('warn', 'crhMap.validNGR()', 'invalid input (1): {}'.format(ngr))
+        return ngr[0:2].upper() in _regionOffsets
     else:   # unexpected error!
-        statusErrMsg('warn', 'crhMap.validNGR()', 'invalid input (2): {}'.format(ngr))
+        statusErrMsg('warn', 'crhMap.validNGR()', 'invalid input: {}'.format(ngr))
     return False
 
+def validNGRArray(ngrs):
+    '''
+    vectorised version of validNGR(), for bulk data cleaning (no warning messages)
+    return boolean numpy array, True where the NGR string is valid (same shape as ngrs)
+    '''
+    return _parseNGRArray(ngrs)[2]
+
 def deg2dms(degrees):
     '''
     convert decimal degrees reading to (degrees, minutes, seconds) tuple
@@ -414,14 +1628,94 @@ def dms2deg(dmsTpl):
     else:
         return round(decimalDeg, 4)
 
+def deg2dmsArray(degrees):
+    '''
+    vectorised version of deg2dms(), same boundary & sign rules
+    return (degrees, minutes, seconds) tuple of integer numpy arrays (same shape as degrees)
+    '''
+    degrees = np.asarray(degrees)
+    if degrees.dtype.kind in 'iu':  # special case
+        zeros = np.zeros(degrees.shape, dtype=np.int64)
+        return (degrees.astype(np.int64), zeros, zeros.copy())
+    degrees = degrees.astype(np.float64)
+    sign = np.where(degrees < 0.0, -1, 1)
+    degrees = np.abs(degrees)
+    minutes = (degrees - np.floor(degrees)) * 60.0
+    seconds = np.floor((minutes - np.floor(minutes)) * 60.0 + 0.5).astype(np.int64)
+
+    # make boundary adjustments [eg: to avoid returning (1, 19, 60)]
+    carry = (seconds == 60)
+    seconds[carry] = 0
+    minutes = np.floor(minutes + carry).astype(np.int64)
+    carry = (minutes == 60)
+    minutes[carry] = 0
+    degrees = np.floor(degrees + carry).astype(np.int64)
+    return (sign*degrees, sign*minutes, sign*seconds)
+
+def dms2degArray(degrees, minutes, seconds):
+    '''
+    vectorised version of dms2deg(), same sign rules (sign taken from degrees)
+    arguments are arrays (or lists) of degrees, minutes, seconds, result is a float numpy array
+    '''
+    degrees = np.asarray(degrees, dtype=np.float64)
+    decimalDeg = np.abs(degrees) + np.abs(np.asarray(minutes, dtype=np.float64))/60.0 + \
+                 np.abs(np.asarray(seconds, dtype=np.float64))/3600.0
+    decimalDeg = np.floor(decimalDeg*10000.0 + 0.5)/10000.0  # round to 4dp, half away from zero like round()
+    return np.where(degrees < 0.0, -decimalDeg, decimalDeg)
+
 ## initialise
 
 # codes for 100 km grid squares -- shuffle so indices correspond to offsets
 _regions=np.array( [ _regions[x] for x in range(12,-1,-1) ] )
 _regions=_regions.transpose()
 
+# 100 km grid square codes as (x_box, y_box, 2) byte array for osgb2ngrArray()
+_regionChars = np.ascontiguousarray(_regions, dtype='S2').view(np.uint8).reshape(_regions.shape + (2,))
+
+# index of 100 km grid square codes to (east, north) offsets (m), avoids searching _regions
+_regionOffsets = {}
+# & equivalent lookup table for array functions, indexed by (letter1*26 + letter2),
+# value (x_box*13 + y_box), or -1 if invalid code
+_regionLookup = np.empty(26*26, dtype=np.int64)
+_regionLookup.fill(-1)
+for x_box in range(_regions.shape[0]):
+    for y_box in range(_regions.shape[1]):
+        _regionOffsets[_regions[x_box, y_box]] = (100000*x_box, 100000*y_box)
+        _regionLookup[(ord(_regions[x_box, y_box][0]) - ord('A'))*26 + ord(_regions[x_box, y_box][1]) - ord('A')] = x_box*13 + y_box
+
+# WGS84 <-> OSGB36 transformation engine used by the conversion functions
+osgbTransformer = Transformer()
+
 ## testing code
 
 if __name__ == '__main__':  # add tests here
-    print 'crhMap.py -- mapping utilities (tier 3)'
-    print 'use crhMap-Test.py to test this module'
+    if len(sys.argv) == 1:
+        print 'crhMap.py -- mapping utilities (tier 3)'
+        print 'use crhMap-Test.py to test this module'
+        print 'use python -m crhMap convert -h for file conversion'
+        exit(0)
+    # file conversion command line tool
+    parser = argparse.ArgumentParser(prog = 'python -m crhMap', description = 'mapping utilities (tier 3)')
+    commands = parser.add_subparsers(dest = 'command')
+    convert = commands.add_parser('convert', help = 'convert coordinates in a BSV/CSV file with a header line',
+                                  description = 'add easting, northing & ngr columns to a file with latitude & longitude columns, '
+                                  'or (reverse) latitude & longitude columns to a file with easting & northing, or ngr, columns')
+    convert.add_argument('infile', help = 'input filename (- for stdin)')
+    convert.add_argument('outfile', help = 'output filename (- for stdout)')
+    convert.add_argument('-r', '--reverse', action = 'store_true', help = 'convert OSGB36 to WGS84 lat, lon')
+    convert.add_argument('-p', '--precision', type = int, default = 8, choices = [4, 6, 8, 10], help = 'ngr precision (digits, default 8)')
+    convert.add_argument('-c', '--chunk', type = int, default = 100000, help = 'records converted at a time (default 100000)')
+    convert.add_argument('-s', '--sep', help = "field separator (default ',' for .csv files, '|' otherwise)")
+    convert.add_argument('-g', '--gridshift', help = 'binary grid shift file (instead of Helmert transform)')
+    convert.add_argument('-j', '--processes', type = int, default = 1, help = 'worker processes (default 1, 0 for number of cpus)')
+    args = parser.parse_args()
+    if args.gridshift:
+        setGridShift(args.gridshift)
+    if args.processes != 1 and args.infile != '-' and args.outfile != '-':
+        (records, secs) = bulkConvertFile(args.infile, args.outfile, processes = args.processes or None,
+                                          reverse = args.reverse, nDigits = args.precision, chunkSize = args.chunk, sep = args.sep)
+    else:
+        (records, secs) = convertFile(sys.stdin if args.infile == '-' else args.infile,
+                                      sys.stdout if args.outfile == '-' else args.outfile,
+                                      reverse = args.reverse, nDigits = args.precision, chunkSize = args.chunk, sep = args.sep)
+    errMsg('>> {} records converted in {:.2f}sec ({:.0f} records/sec)'.format(records, secs, records/secs if secs else 0))